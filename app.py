@@ -1,18 +1,103 @@
 """Weather Prediction Databricks App - Main FastAPI application."""
-from fastapi import FastAPI, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
+from typing import Annotated, Dict, List, Optional, Union
+import aiohttp
+import asyncio
+import hashlib
 import os
 
-from server.weather import get_current_weather, get_weather_description
-from server.llm import predict_weather
+from server.config import (
+    credentials,
+    BATCH_MAX_LOCATIONS,
+    BATCH_PREDICTION_CONCURRENCY,
+    ASYNC_PREDICTIONS,
+    JOB_MAX_WAIT_SECONDS,
+    REQUEST_DEADLINE_SECONDS,
+    SUBSCRIPTION_HEARTBEAT_SECONDS,
+    WEATHER_FORECAST_MODE,
+)
+from server.weather import (
+    get_current_weather,
+    get_current_weather_batch,
+    start_session,
+    close_session,
+    get_session_stats,
+    peek_current_weather,
+    observation_ttl,
+    quantize,
+    weather_cache,
+    forecast_cache,
+    weather_breaker,
+    weather_hedger,
+    WeatherAPIError,
+)
+from server.llm import (
+    predict_weather,
+    stream_prediction,
+    close_llm_client,
+    prediction_cache,
+    endpoint_router,
+    prediction_batcher,
+    llm_admission,
+    PROMPT_VERSION,
+)
+from server.nowcast import nowcaster
+from server.jobs import prediction_jobs
+from server.metrics import metrics, stage, TimingMiddleware
+from server.resilience import CircuitOpenError, deadline
+from server.admission import BACKGROUND, ClientIdentityMiddleware, request_priority
+from server.subscriptions import SubscriptionHub, SubscriptionLimitError
+from server.store import persistent_store
+from server.shared_cache import shared_cache
+from server.history import observation_history
+from server.models import Conditions, FastJSONResponse, WeatherResponse, dumps
+from server.warmup import warmup
+from server.refresher import refresher
+from server.static import StaticAssets, StaticFilesApp
+
+# Built frontend, served from memory
+static_assets = StaticAssets(os.path.join(os.path.dirname(__file__), "frontend", "dist"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared upstream connections on startup and close them on shutdown."""
+    if static_assets.enabled:
+        await asyncio.to_thread(static_assets.load)
+    if shared_cache.enabled:
+        # Let worker processes share cached results and upstream fetches
+        await shared_cache.open()
+        weather_cache.shared = shared_cache
+        prediction_cache.shared = shared_cache
+        prediction_jobs.shared = shared_cache
+    if persistent_store.enabled:
+        # Warm the caches from the previous run before taking traffic
+        await persistent_store.open()
+        await persistent_store.attach(weather_cache)
+        await persistent_store.attach(prediction_cache)
+    app.state.weather_session = await start_session()
+    await warmup.start()
+    refresher.start()
+    try:
+        yield
+    finally:
+        warmup.cancel()
+        refresher.cancel()
+        subscriptions.close()
+        prediction_jobs.cancel_all()
+        await close_session()
+        await close_llm_client()
+        await persistent_store.close()
+        await shared_cache.close()
 
 app = FastAPI(
     title="Weather Prediction App",
     description="Predict weather 5 minutes from now using AI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Enable CORS for local development
@@ -24,63 +109,435 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-client identity for fair queueing at the serving endpoint
+app.add_middleware(ClientIdentityMiddleware)
+
+# Per-stage Server-Timing headers and request metrics
+app.add_middleware(TimingMiddleware)
+
+metrics.describe("cache_hits_total", "counter", "Cache lookups served from the cache")
+metrics.describe("cache_misses_total", "counter", "Cache lookups that went upstream")
+metrics.describe("cache_coalesced_total", "counter", "Cache misses that joined an in-flight fetch")
+metrics.describe("cache_evictions_total", "counter", "Entries evicted to stay within bounds")
+metrics.describe("weather_connections_total", "counter", "Open-Meteo connections by new or reused")
+metrics.describe("predictions_total", "counter", "Predictions by local nowcast or LLM")
+metrics.describe("conditional_requests_total", "counter", "If-None-Match requests by outcome")
+metrics.describe("hedged_requests_total", "counter", "Hedge requests sent after a slow first attempt")
+metrics.describe("hedge_wins_total", "counter", "Hedge requests that answered first")
+metrics.describe("circuit_breaker_open", "gauge", "1 while the upstream circuit breaker is open or half-open")
+metrics.describe("circuit_breaker_trips_total", "counter", "Times the upstream circuit breaker opened")
+metrics.describe("circuit_breaker_rejections_total", "counter", "Calls failed fast by an open circuit breaker")
+metrics.describe("llm_batches_total", "counter", "Serving-endpoint calls made by the prediction micro-batcher")
+metrics.describe("llm_batched_predictions_total", "counter", "Predictions answered through the micro-batcher")
+metrics.describe("llm_batch_fallbacks_total", "counter", "Batched answers that were malformed and retried individually")
+metrics.describe("shared_cache_requests_total", "counter", "Cross-process cache lookups by result")
+metrics.describe("admission_limit", "gauge", "Adaptive concurrency limit for serving-endpoint calls")
+metrics.describe("admission_in_flight", "gauge", "Serving-endpoint calls holding an admission slot")
+metrics.describe("admission_queued", "gauge", "Calls waiting for an admission slot")
+metrics.describe("admission_shed_total", "counter", "Calls shed by admission control, answered with a degraded prediction")
+metrics.describe("llm_routed_total", "counter", "Serving-endpoint calls by endpoint, requested tier and outcome")
+metrics.describe("llm_failovers_total", "counter", "Calls moved to another serving endpoint after this one failed")
+metrics.describe("llm_endpoint_duration_seconds", "histogram", "Latency of successful calls per serving endpoint")
+metrics.describe("llm_endpoint_latency_ewma_seconds", "gauge", "Moving average latency the router ranks endpoints by")
+metrics.describe("llm_endpoint_error_rate_ewma", "gauge", "Moving average error rate per serving endpoint")
+metrics.describe("subscriptions", "gauge", "Open push subscriptions")
+metrics.describe("subscription_cells", "gauge", "Grid cells with an active refresh loop")
+metrics.describe("subscription_publishes_total", "counter", "Updates pushed to subscribers of a cell")
+metrics.describe("refresher_hot_cells", "gauge", "Grid cells the background refresher keeps fresh")
+metrics.describe("refresher_refreshes_total", "counter", "Background refreshes of hot cells by outcome")
+metrics.describe("refresher_refresh_duration_seconds", "histogram", "Time to refresh a hot cell's weather and prediction")
+metrics.describe("refresher_stale_served_total", "counter", "Requests answered stale while their hot cell refreshed")
+metrics.describe("refresher_over_budget_total", "counter", "Refreshes skipped for lack of upstream request budget")
+
+@metrics.collector
+def collect_component_stats():
+    for cache in (weather_cache, forecast_cache, prediction_cache):
+        stats = cache.stats()
+        labels = {"cache": cache.name}
+        yield "cache_hits_total", labels, stats["hits"]
+        yield "cache_misses_total", labels, stats["misses"]
+        yield "cache_coalesced_total", labels, stats["coalesced"]
+        yield "cache_evictions_total", labels, stats["evictions"]
+        yield "cache_entries", labels, stats["entries"]
+        yield "cache_inflight", labels, stats["inflight"]
+    session = get_session_stats()
+    yield "weather_connections_total", {"kind": "created"}, session["connections_created"]
+    yield "weather_connections_total", {"kind": "reused"}, session["connections_reused"]
+    nowcast = nowcaster.stats()
+    yield "predictions_total", {"path": "local"}, nowcast["local"]
+    yield "predictions_total", {"path": "llm"}, nowcast["llm"]
+    if shared_cache.enabled:
+        shared = shared_cache.stats()
+        for result in ("hits", "misses", "waits", "lease_timeouts", "errors"):
+            yield "shared_cache_requests_total", {"result": result}, shared[result]
+    admission = llm_admission.stats()
+    yield "admission_limit", {}, admission["limit"]
+    yield "admission_in_flight", {}, admission["in_flight"]
+    yield "admission_queued", {}, admission["queued"]
+    for reason, count in admission["shed"].items():
+        yield "admission_shed_total", {"reason": reason}, count
+    batching = prediction_batcher.stats()
+    yield "llm_batches_total", {}, batching["batches"]
+    yield "llm_batched_predictions_total", {}, batching["batched_items"]
+    yield "llm_batch_fallbacks_total", {}, batching["fallbacks"]
+    jobs = prediction_jobs.stats()
+    yield "prediction_jobs", {"state": "pending"}, jobs["pending"]
+    yield "prediction_jobs", {"state": "held"}, jobs["jobs"]
+    hedger = weather_hedger.stats()
+    yield "hedged_requests_total", {"upstream": weather_hedger.name}, hedger["hedges"]
+    yield "hedge_wins_total", {"upstream": weather_hedger.name}, hedger["hedge_wins"]
+    for breaker in (weather_breaker, *endpoint_router.breakers()):
+        labels = {"upstream": breaker.name}
+        yield "circuit_breaker_open", labels, int(breaker.state != breaker.CLOSED)
+        yield "circuit_breaker_trips_total", labels, breaker.trips
+        yield "circuit_breaker_rejections_total", labels, breaker.rejections
+    for name, endpoint in endpoint_router.stats().items():
+        labels = {"endpoint": name, "tier": endpoint["tier"]}
+        if endpoint["latency_ewma_ms"] is not None:
+            yield "llm_endpoint_latency_ewma_seconds", labels, endpoint["latency_ewma_ms"] / 1000
+        yield "llm_endpoint_error_rate_ewma", labels, endpoint["error_rate_ewma"]
+    hub = subscriptions.stats()
+    yield "subscriptions", {}, hub["subscribers"]
+    yield "subscription_cells", {}, hub["cells"]
+    yield "subscription_publishes_total", {}, hub["publishes"]
+    if refresher.enabled:
+        yield "refresher_hot_cells", {}, len(refresher.hot)
+        yield "refresher_over_budget_total", {}, refresher.over_budget
+
 class LocationRequest(BaseModel):
     latitude: float
     longitude: float
 
-class WeatherResponse(BaseModel):
-    current: dict
-    prediction: str
-    location: dict
-    timestamp: str
+class BatchRequest(BaseModel):
+    locations: List[LocationRequest]
 
 @app.get("/")
 async def root():
-    """Health check endpoint."""
-    return {"status": "ok", "app": "Weather Prediction"}
+    """Health check endpoint; 503 while a background warm-up is still running."""
+    body = {"status": "ok", "app": "Weather Prediction", "warmup": warmup.state}
+    if not warmup.ready:
+        return JSONResponse({**body, "status": "warming"}, status_code=503, headers={"Retry-After": "1"})
+    return body
+
+@app.get("/api/stats")
+async def get_stats():
+    """Upstream connection and cache statistics."""
+    return {
+        "weather_session": get_session_stats(),
+        "weather_cache": weather_cache.stats(),
+        "forecast_cache": {
+            **forecast_cache.stats(),
+            "enabled": WEATHER_FORECAST_MODE,
+        },
+        "prediction_cache": prediction_cache.stats(),
+        "nowcast": nowcaster.stats(),
+        "prediction_batching": prediction_batcher.stats(),
+        "prediction_jobs": prediction_jobs.stats(),
+        "subscriptions": subscriptions.stats(),
+        "persistent_store": persistent_store.stats(),
+        "shared_cache": shared_cache.stats(),
+        "history": observation_history.stats(),
+        "warmup": warmup.stats(),
+        "refresher": refresher.stats(),
+        "static": static_assets.stats(),
+        "resilience": {
+            "weather_hedging": weather_hedger.stats(),
+            "weather_breaker": weather_breaker.stats(),
+            "llm_endpoints": endpoint_router.stats(),
+            "llm_admission": llm_admission.stats(),
+        },
+        "credentials": {
+            "refreshes": credentials.refreshes,
+            "version": credentials.snapshot()[1],
+        },
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text-format metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def upstream_error(e: Exception) -> HTTPException:
+    """Map a failure to 504 (timeout), 502 (upstream) or 500, and count it."""
+    metrics.inc("errors_total", {"type": type(e).__name__})
+    if isinstance(e, asyncio.TimeoutError):
+        return HTTPException(status_code=504, detail=f"Upstream timeout: {str(e) or type(e).__name__}")
+    if isinstance(e, (WeatherAPIError, CircuitOpenError, aiohttp.ClientError)):
+        return HTTPException(status_code=502, detail=str(e))
+    return HTTPException(status_code=500, detail=str(e))
+
+def weather_etag(lat: float, lon: float, weather_data: Conditions) -> str:
+    """ETag from the grid cell, the observation time and the prediction version."""
+    cell = quantize(lat, lon)
+    raw = "|".join([
+        f"{cell[0]},{cell[1]}",
+        str(weather_data.current.time),
+        PROMPT_VERSION,
+        endpoint_router.signature,
+    ])
+    return '"' + hashlib.sha1(raw.encode()).hexdigest()[:20] + '"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def cache_headers(etag: str, weather_data: Conditions) -> Dict[str, str]:
+    """Let browsers and proxies reuse the response until the next observation."""
+    max_age = int(observation_ttl(weather_data))
+    return {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
 
 @app.get("/api/weather")
-async def get_weather(lat: float = 40.7128, lon: float = -74.0060):
+async def get_weather(
+    lat: float = 40.7128,
+    lon: float = -74.0060,
+    async_prediction: Optional[bool] = None,
+    if_none_match: Annotated[Optional[str], Header()] = None
+):
     """
     Get current weather and 5-minute prediction.
 
+    Responses carry an ETag for the grid cell's current observation and a
+    `Cache-Control` max-age running until the next one. A matching
+    `If-None-Match` is answered with 304 from the cache, without any
+    upstream call.
+
     Args:
         lat: Latitude (default: NYC)
         lon: Longitude (default: NYC)
+        async_prediction: Return immediately with `prediction_id` instead of
+            the prediction; collect it from `/api/predictions/{prediction_id}`
+            (default: ASYNC_PREDICTIONS)
     """
+    if async_prediction is None:
+        async_prediction = ASYNC_PREDICTIONS
+
+    if if_none_match and not async_prediction:
+        cached = peek_current_weather(lat, lon)
+        if cached is not None:
+            etag = weather_etag(lat, lon, cached)
+            if etag_matches(if_none_match, etag):
+                metrics.inc("conditional_requests_total", {"result": "not_modified"})
+                return Response(status_code=304, headers=cache_headers(etag, cached))
+        metrics.inc("conditional_requests_total", {"result": "modified"})
+
     try:
-        # Get current weather
-        weather_data = await get_current_weather(latitude=lat, longitude=lon)
-        current = weather_data["current"]
+        with deadline(REQUEST_DEADLINE_SECONDS):
+            # Get current weather; a hot cell may be served stale while it refreshes
+            weather_data = await refresher.current_weather(lat, lon)
+
+            if async_prediction:
+                # Nobody is waiting on the response, so the job queues behind interactive calls
+                with request_priority(BACKGROUND):
+                    job_id = prediction_jobs.submit(predict_weather(weather_data.current, weather_data.location))
+                payload = WeatherResponse(weather_data, None, job_id)
+            else:
+                # Generate AI prediction
+                prediction = await predict_weather(weather_data.current, weather_data.location)
+                payload = WeatherResponse(weather_data, prediction)
+    except Exception as e:
+        raise upstream_error(e)
 
-        # Add weather description
-        weather_code = current.get("weather_code", 0)
-        current["description"] = get_weather_description(weather_code)
+    if async_prediction or payload.stale or payload.degraded:
+        # Not keyed by the ETag: a later request should get the fresh answer
+        headers = {"Cache-Control": "no-store"}
+    else:
+        headers = cache_headers(weather_etag(lat, lon, weather_data), weather_data)
+    with stage("serialize"):
+        return FastJSONResponse(payload, headers=headers)
 
-        # Generate AI prediction
-        prediction = await predict_weather(current)
+@app.get("/api/weather/history")
+async def get_weather_history(
+    lat: float = 40.7128,
+    lon: float = -74.0060,
+    window_minutes: Optional[float] = Query(None, gt=0)
+):
+    """
+    Recent observations for a location's grid cell with trend statistics.
 
-        return {
-            "current": current,
-            "prediction": prediction,
-            "location": weather_data["location"],
-            "timestamp": weather_data["timestamp"]
-        }
+    Per field: latest value, mean, min, max, standard deviation, net change
+    and least-squares rate of change per hour over the window. The current
+    observation is fetched first, so a new location has at least one point.
+
+    Args:
+        lat: Latitude (default: NYC)
+        lon: Longitude (default: NYC)
+        window_minutes: Only use observations this recent (default: all kept)
+    """
+    try:
+        with deadline(REQUEST_DEADLINE_SECONDS):
+            await get_current_weather(latitude=lat, longitude=lon)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
+    cell = quantize(lat, lon)
+    with stage("history"):
+        history = observation_history.series(cell, window_minutes)
+    return {"location": {"latitude": cell[0], "longitude": cell[1]}, **history}
+
+@app.get("/api/predictions/{prediction_id}")
+async def get_prediction(prediction_id: str, wait: float = 0):
+    """
+    Collect a background prediction started by `/api/weather?async_prediction=true`.
+
+    Args:
+        prediction_id: Id returned with the current conditions
+        wait: Seconds to long-poll for the result before answering `pending`
+    """
+    job = await prediction_jobs.result(prediction_id, wait=min(max(wait, 0), JOB_MAX_WAIT_SECONDS))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired prediction id")
+    return job
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+@app.get("/api/weather/stream")
+async def stream_weather(request: Request, lat: float = 40.7128, lon: float = -74.0060):
+    """
+    Stream current weather and the 5-minute prediction as Server-Sent Events.
+
+    Events: `weather` (current conditions, sent as soon as Open-Meteo answers),
+    `token` (prediction text chunks), then `done` with the full prediction,
+    or `error`.
+    """
+    try:
+        with deadline(REQUEST_DEADLINE_SECONDS):
+            weather_data = await refresher.current_weather(lat, lon)
+    except Exception as e:
+        raise upstream_error(e)
+
+    async def events():
+        yield _sse("weather", {
+            "current": weather_data.current,
+            "location": weather_data.location,
+            "timestamp": weather_data.timestamp
+        })
+        tokens = stream_prediction(weather_data.current, weather_data.location)
+        parts = []
+        try:
+            async for token in tokens:
+                if await request.is_disconnected():
+                    return
+                parts.append(token)
+                yield _sse("token", {"text": token})
+            yield _sse("done", {"prediction": "".join(parts)})
+        except Exception as e:
+            yield _sse("error", {"detail": f"Error generating prediction: {str(e)}"})
+        finally:
+            # Closing the generator closes the upstream completion stream
+            await tokens.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def load_cell_weather(lat: float, lon: float) -> WeatherResponse:
+    """Current conditions and prediction for a subscribed grid cell."""
+    with deadline(REQUEST_DEADLINE_SECONDS), request_priority(BACKGROUND):
+        weather_data = await get_current_weather(latitude=lat, longitude=lon)
+        prediction = await predict_weather(weather_data.current, weather_data.location)
+    return WeatherResponse(weather_data, prediction)
+
+subscriptions = SubscriptionHub(load_cell_weather)
+
+@app.get("/api/weather/subscribe")
+async def subscribe_weather(request: Request, lat: float = 40.7128, lon: float = -74.0060):
+    """
+    Push weather updates for a location as Server-Sent Events.
+
+    Sends a `weather` event with the current conditions and prediction, then
+    another whenever the location's grid cell gets a new observation or
+    prediction. All subscribers of a cell share one refresh loop; a slow
+    client only ever receives the latest update. Idle connections get a
+    comment line every SUBSCRIPTION_HEARTBEAT_SECONDS.
+    """
+    if subscriptions.full:
+        raise HTTPException(status_code=503, detail="Too many subscriptions", headers={"Retry-After": "30"})
+
+    async def events():
+        # Subscribed on the first iteration, right before the `finally` that
+        # undoes it: a generator that never starts (the client left before the
+        # response began) is never finalized
+        try:
+            subscriber = subscriptions.subscribe(lat, lon)
+        except SubscriptionLimitError as e:
+            # Filled up since the check above; the response has already started
+            yield _sse("error", {"detail": str(e)})
+            return
+        try:
+            while not await request.is_disconnected():
+                payload = await subscriber.next(SUBSCRIPTION_HEARTBEAT_SECONDS)
+                if payload is None:
+                    yield ": ping\n\n"
+                else:
+                    yield _sse("weather", payload)
+        finally:
+            subscriptions.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.post("/api/weather")
 async def get_weather_for_location(location: LocationRequest):
     """Get weather for a specific location."""
     return await get_weather(lat=location.latitude, lon=location.longitude)
 
+@app.post("/api/weather/batch")
+async def get_weather_batch(batch: BatchRequest):
+    """
+    Get current weather and predictions for many locations.
+
+    Weather is fetched in as few Open-Meteo requests as possible and
+    predictions run with bounded concurrency. Each result either has the
+    usual weather fields or an `error`, so one bad location does not fail
+    the whole batch.
+    """
+    if len(batch.locations) > BATCH_MAX_LOCATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BATCH_MAX_LOCATIONS} locations per batch"
+        )
+
+    semaphore = asyncio.Semaphore(BATCH_PREDICTION_CONCURRENCY)
+
+    async def build_result(location: LocationRequest, weather_data) -> Union[WeatherResponse, dict]:
+        if isinstance(weather_data, Exception):
+            return {
+                "location": {"latitude": location.latitude, "longitude": location.longitude},
+                "error": str(weather_data)
+            }
+        async with semaphore:
+            prediction = await predict_weather(weather_data.current, weather_data.location)
+        return WeatherResponse(weather_data, prediction)
+
+    # One deadline for weather and predictions; a prediction that runs out of
+    # it is answered degraded like on the other routes
+    with deadline(REQUEST_DEADLINE_SECONDS):
+        weather = await get_current_weather_batch(
+            [(loc.latitude, loc.longitude) for loc in batch.locations]
+        )
+        # Bulk predictions queue behind interactive ones at the serving endpoint
+        with request_priority(BACKGROUND):
+            results = await asyncio.gather(
+                *[build_result(loc, data) for loc, data in zip(batch.locations, weather)]
+            )
+    with stage("serialize"):
+        return FastJSONResponse({"results": results})
+
 # Serve React frontend (when built)
-frontend_dir = os.path.join(os.path.dirname(__file__), "frontend", "dist")
-if os.path.exists(frontend_dir):
-    app.mount("/assets", StaticFiles(directory=os.path.join(frontend_dir, "assets")), name="assets")
+if static_assets.enabled:
+    app.mount("/assets", StaticFilesApp(static_assets, "assets"), name="assets")
 
     @app.get("/{full_path:path}")
-    async def serve_spa(full_path: str):
+    async def serve_spa(full_path: str, request: Request):
         """Serve the React SPA for all non-API routes."""
         if not full_path.startswith("api"):
-            return FileResponse(os.path.join(frontend_dir, "index.html"))
+            # Files at the top of dist by name, client-side routes get index.html
+            return (
+                static_assets.response(full_path, request.headers)
+                or static_assets.response("index.html", request.headers)
+            )
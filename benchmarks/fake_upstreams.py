@@ -0,0 +1,255 @@
+"""Local stand-ins for Open-Meteo and the Databricks serving endpoints."""
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Optional
+from datetime import datetime, timezone
+from aiohttp import web
+
+@dataclass
+class LatencyProfile:
+    """Log-normal latency with a given median, plus an error rate."""
+    median_ms: float = 50.0
+    sigma: float = 0.3
+    error_rate: float = 0.0
+
+    def sample(self) -> float:
+        if self.median_ms <= 0:
+            return 0.0
+        return self.median_ms * math.exp(random.gauss(0, self.sigma)) / 1000
+
+    def fails(self) -> bool:
+        return random.random() < self.error_rate
+
+PREDICTION_TEXT = (
+    "Conditions should stay much the same over the next five minutes. "
+    "Expect similar temperatures and a light breeze, so no need to change your plans."
+)
+
+BATCH_PROMPT = re.compile(r"JSON array of exactly (\d+) strings")
+
+class FakeUpstreams:
+    """
+    Serves `/v1/forecast` and `/serving-endpoints/chat/completions` on one port.
+
+    Runs its own event loop in a background thread so it does not compete with
+    the load generator. `calls` counts requests per upstream; a batched
+    weather request counts once in `weather` and once per coordinate in
+    `weather_locations` (and `weather_windows` for forecast-mode series
+    requests), and each LLM request also counts in `llm:<model>`.
+    `models` overrides the `llm` latency profile for particular model names.
+    """
+
+    def __init__(
+        self,
+        weather: LatencyProfile = None,
+        llm: LatencyProfile = None,
+        token_delay_ms: float = 20.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        models: Optional[Dict[str, LatencyProfile]] = None,
+    ):
+        self.weather = weather or LatencyProfile(median_ms=80)
+        self.llm = llm or LatencyProfile(median_ms=1500)
+        self.models = models or {}
+        self.token_delay_ms = token_delay_ms
+        self.host = host
+        self.port = port
+        self.calls: Counter = Counter()
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def reset(self):
+        self.calls.clear()
+
+    def start(self) -> "FakeUpstreams":
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        app = web.Application()
+        app.router.add_get("/v1/forecast", self.forecast)
+        app.router.add_post("/serving-endpoints/chat/completions", self.chat_completions)
+        self._runner = web.AppRunner(app, access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, self.host, self.port)
+        self._loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def forecast(self, request: web.Request) -> web.Response:
+        self.calls["weather"] += 1
+        latitudes = request.query.get("latitude", "0").split(",")
+        longitudes = request.query.get("longitude", "0").split(",")
+        self.calls["weather_locations"] += len(latitudes)
+        await asyncio.sleep(self.weather.sample())
+        if self.weather.fails():
+            self.calls["weather_errors"] += 1
+            return web.json_response({"error": True, "reason": "simulated"}, status=500)
+        if any(abs(float(lat)) > 90 for lat in latitudes) or any(abs(float(lon)) > 180 for lon in longitudes):
+            # Like Open-Meteo, one bad coordinate rejects the whole request
+            return web.json_response({"error": True, "reason": "Latitude must be in range of -90 to 90°"}, status=400)
+
+        if "minutely_15" in request.query:
+            # Forecast-mode request for a window of series
+            self.calls["weather_windows"] += len(latitudes)
+            items = [
+                _series_item(float(lat), float(lon), request.query)
+                for lat, lon in zip(latitudes, longitudes)
+            ]
+            return web.json_response(items[0] if len(items) == 1 else items)
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        observed = now.replace(minute=now.minute // 15 * 15, second=0, microsecond=0)
+        items = [
+            _forecast_item(float(lat), float(lon), observed)
+            for lat, lon in zip(latitudes, longitudes)
+        ]
+        return web.json_response(items[0] if len(items) == 1 else items)
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        self.calls["llm"] += 1
+        body = await request.json()
+        self.calls[f"llm:{body['model']}"] += 1
+        profile = self.models.get(body["model"], self.llm)
+        if profile.fails():
+            self.calls["llm_errors"] += 1
+            await asyncio.sleep(profile.sample() / 10)
+            return web.json_response({"error": {"message": "simulated overload"}}, status=429)
+
+        if not body.get("stream"):
+            await asyncio.sleep(profile.sample())
+            batch = BATCH_PROMPT.search(body["messages"][-1]["content"])
+            if batch:
+                # Micro-batched prompt: answer with one prediction per location
+                self.calls["llm_batched_locations"] += int(batch.group(1))
+                text = json.dumps([PREDICTION_TEXT] * int(batch.group(1)))
+                return web.json_response(_completion(body["model"], text))
+            return web.json_response(_completion(body["model"], PREDICTION_TEXT))
+
+        self.calls["llm_streams"] += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        # Time to first token is the sampled latency; the rest is per-token delay
+        await asyncio.sleep(profile.sample())
+        for word in PREDICTION_TEXT.split(" "):
+            chunk = _chunk(body["model"], word + " ")
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await asyncio.sleep(self.token_delay_ms / 1000)
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+def _forecast_item(latitude: float, longitude: float, observed: datetime) -> dict:
+    # Deterministic per location and observation, like the real API
+    rng = random.Random(f"{latitude:.2f},{longitude:.2f},{observed}")
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "timezone": "GMT",
+        "utc_offset_seconds": 0,
+        "current": {
+            "time": observed.isoformat(timespec="minutes"),
+            "interval": 900,
+            "temperature_2m": round(rng.uniform(20, 90), 1),
+            "relative_humidity_2m": rng.randint(20, 95),
+            "apparent_temperature": round(rng.uniform(20, 90), 1),
+            "precipitation": rng.choice([0.0, 0.0, 0.0, 0.4]),
+            "weather_code": rng.choice([0, 1, 2, 3, 3, 61, 95]),
+            "cloud_cover": rng.randint(0, 100),
+            "wind_speed_10m": round(rng.uniform(0, 25), 1),
+            "wind_direction_10m": rng.randint(0, 359),
+            "surface_pressure": round(rng.uniform(990, 1030), 1),
+        },
+    }
+
+def _series_item(latitude: float, longitude: float, query) -> dict:
+    # Smooth daily cycles around per-location means, as unixtime series
+    rng = random.Random(f"{latitude:.2f},{longitude:.2f}")
+    now = int(time.time())
+
+    def series(step: int, past: int, ahead: int, fields: str) -> dict:
+        start = now // step * step - past * step
+        times = [start + i * step for i in range(past + ahead)]
+        block = {"time": times}
+        for field in filter(None, fields.split(",")):
+            base, swing = rng.uniform(*SERIES_RANGES.get(field, (0, 100))), rng.uniform(0, 5)
+            phase = rng.uniform(0, 2 * math.pi)
+            values = [base + swing * math.sin(2 * math.pi * t / 86400 + phase) for t in times]
+            if field == "weather_code":
+                values = [rng.choice([0, 1, 2, 3])] * len(times)
+            elif field == "precipitation":
+                values = [0.0] * len(times)
+            elif field == "wind_direction_10m":
+                values = [value % 360 for value in values]
+            block[field] = [round(value, 1) for value in values]
+        return block
+
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "timezone": "GMT",
+        "utc_offset_seconds": 0,
+        "minutely_15": series(
+            900, int(query.get("past_minutely_15", 1)), int(query.get("forecast_minutely_15", 24)), query["minutely_15"]
+        ),
+        "hourly": series(
+            3600, int(query.get("past_hours", 1)), int(query.get("forecast_hours", 6)), query.get("hourly", "")
+        ),
+    }
+
+SERIES_RANGES = {
+    "temperature_2m": (20, 90),
+    "apparent_temperature": (20, 90),
+    "relative_humidity_2m": (20, 95),
+    "precipitation": (0, 0),
+    "wind_speed_10m": (0, 15),
+    "wind_direction_10m": (0, 359),
+    "cloud_cover": (0, 100),
+    "surface_pressure": (990, 1030),
+}
+
+def _completion(model: str, text: str) -> dict:
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": text},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 200, "completion_tokens": 40, "total_tokens": 240},
+    }
+
+def _chunk(model: str, text: str) -> dict:
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}],
+    }
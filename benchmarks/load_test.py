@@ -0,0 +1,250 @@
+"""
+Load test app:app against local fake upstreams.
+
+Each scenario starts the app in a fresh uvicorn subprocess pointed at the
+fakes, drives it with a closed-loop load generator and reports latency
+percentiles, throughput and upstream call counts.
+
+Usage:
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --scenarios baseline,cached --duration 20 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import aiohttp
+
+from .fake_upstreams import FakeUpstreams, LatencyProfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@dataclass
+class Scenario:
+    name: str
+    path: str = "/api/weather"
+    env: Dict[str, str] = field(default_factory=dict)
+    # Share of requests for the default (NYC) location; the rest are random
+    hot_fraction: float = 0.8
+
+# Endpoint names for the routed scenario; the fakes give each its own latency profile
+FAST_MODEL, LARGE_MODEL, BACKUP_MODEL = "fake-fast", "fake-large", "fake-large-backup"
+
+SCENARIOS = {
+    "baseline": Scenario(
+        "baseline",
+        env={"WEATHER_CACHE_ENABLED": "false", "PREDICTION_CACHE_ENABLED": "false", "NOWCAST_MODE": "llm"},
+    ),
+    "cached": Scenario("cached", env={"NOWCAST_MODE": "llm"}),
+    "nowcast": Scenario("nowcast"),
+    "forecast": Scenario("forecast", env={"WEATHER_FORECAST_MODE": "true"}),
+    "batched": Scenario(
+        "batched",
+        env={"PREDICTION_CACHE_ENABLED": "false", "NOWCAST_MODE": "llm", "LLM_BATCH_ENABLED": "true"},
+        hot_fraction=0.0,
+    ),
+    "routed": Scenario(
+        "routed",
+        env={
+            "PREDICTION_CACHE_ENABLED": "false",
+            "NOWCAST_MODE": "llm",
+            "SERVING_ENDPOINTS": f"{FAST_MODEL}=fast,{LARGE_MODEL}=large,{BACKUP_MODEL}=large",
+        },
+        hot_fraction=0.0,
+    ),
+    "async": Scenario("async", path="/api/weather?async_prediction=true", env={"NOWCAST_MODE": "llm"}),
+    "stream": Scenario(
+        "stream",
+        path="/api/weather/stream",
+        env={"PREDICTION_CACHE_ENABLED": "false", "NOWCAST_MODE": "llm"},
+    ),
+}
+
+@dataclass
+class Result:
+    scenario: str
+    requests: int
+    errors: int
+    duration: float
+    latencies: List[float]
+    ttfb: List[float]
+    statuses: Counter
+    upstream: Counter
+
+    def summary(self) -> dict:
+        return {
+            "scenario": self.scenario,
+            "requests": self.requests,
+            "errors": self.errors,
+            "rps": round(self.requests / self.duration, 1) if self.duration else 0.0,
+            "p50_ms": percentile(self.latencies, 50),
+            "p95_ms": percentile(self.latencies, 95),
+            "p99_ms": percentile(self.latencies, 99),
+            "ttfb_p50_ms": percentile(self.ttfb, 50),
+            "ttfb_p99_ms": percentile(self.ttfb, 99),
+            "statuses": dict(self.statuses),
+            "upstream": dict(self.upstream),
+        }
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return round(ordered[index] * 1000, 1)
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_app(upstreams: FakeUpstreams, scenario: Scenario, port: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "WEATHER_API_URL": f"{upstreams.url}/v1/forecast",
+        # App mode with a static token keeps the SDK out of the benchmark
+        "DATABRICKS_APP_NAME": "benchmark",
+        "DATABRICKS_HOST": upstreams.url,
+        "DATABRICKS_TOKEN": "benchmark-token",
+    })
+    env.update(scenario.env)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT,
+        env=env,
+    )
+
+async def wait_ready(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"{base_url}/") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"App did not become ready at {base_url}")
+
+def _request_url(base_url: str, scenario: Scenario) -> str:
+    if random.random() < scenario.hot_fraction:
+        return f"{base_url}{scenario.path}"
+    lat, lon = random.uniform(-60, 60), random.uniform(-180, 180)
+    separator = "&" if "?" in scenario.path else "?"
+    return f"{base_url}{scenario.path}{separator}lat={lat:.4f}&lon={lon:.4f}"
+
+async def drive(base_url: str, scenario: Scenario, concurrency: int, duration: float) -> Result:
+    latencies: List[float] = []
+    ttfb: List[float] = []
+    statuses: Counter = Counter()
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async def worker(session: aiohttp.ClientSession):
+        nonlocal errors
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                async with session.get(_request_url(base_url, scenario)) as response:
+                    first = None
+                    async for _ in response.content.iter_any():
+                        if first is None:
+                            first = time.perf_counter()
+                    statuses[response.status] += 1
+                    if response.status >= 400:
+                        errors += 1
+            except aiohttp.ClientError:
+                statuses["exception"] += 1
+                errors += 1
+                continue
+            end = time.perf_counter()
+            latencies.append(end - start)
+            ttfb.append((first or end) - start)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=120)
+    started = time.monotonic()
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        await asyncio.gather(*[worker(session) for _ in range(concurrency)])
+    elapsed = time.monotonic() - started
+    return Result(scenario.name, len(latencies), errors, elapsed, latencies, ttfb, statuses, Counter())
+
+async def run_scenario(
+    upstreams: FakeUpstreams, scenario: Scenario, concurrency: int, duration: float
+) -> Result:
+    port = _free_port()
+    process = start_app(upstreams, scenario, port)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        await wait_ready(base_url)
+        upstreams.reset()
+        result = await drive(base_url, scenario, concurrency, duration)
+        result.upstream = Counter(upstreams.calls)
+        return result
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+def print_table(summaries: List[dict]):
+    columns = ["scenario", "requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "ttfb_p50_ms"]
+    print(" ".join(f"{column:>12}" for column in columns + ["weather", "llm"]))
+    for summary in summaries:
+        row = [str(summary[column]) for column in columns]
+        row += [str(summary["upstream"].get("weather", 0)), str(summary["upstream"].get("llm", 0))]
+        print(" ".join(f"{value:>12}" for value in row))
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenario names")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario")
+    parser.add_argument("--hot-fraction", type=float, default=None, help="Override share of default-location requests")
+    parser.add_argument("--weather-latency-ms", type=float, default=80.0, help="Median Open-Meteo latency")
+    parser.add_argument("--weather-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=1500.0, help="Median serving-endpoint latency")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.3, help="Log-normal spread of upstream latency")
+    parser.add_argument("--fast-llm-latency-ms", type=float, default=400.0, help="Median latency of the routed scenario's fast model")
+    parser.add_argument("--backup-llm-error-rate", type=float, default=0.2, help="Error rate of the routed scenario's backup model")
+    parser.add_argument("--token-delay-ms", type=float, default=20.0, help="Delay between streamed tokens")
+    parser.add_argument("--json", dest="json_path", help="Write the summaries to this file")
+    args = parser.parse_args(argv)
+
+    upstreams = FakeUpstreams(
+        weather=LatencyProfile(args.weather_latency_ms, args.latency_sigma, args.weather_error_rate),
+        llm=LatencyProfile(args.llm_latency_ms, args.latency_sigma, args.llm_error_rate),
+        token_delay_ms=args.token_delay_ms,
+        models={
+            FAST_MODEL: LatencyProfile(args.fast_llm_latency_ms, args.latency_sigma, args.llm_error_rate),
+            BACKUP_MODEL: LatencyProfile(args.llm_latency_ms, args.latency_sigma, args.backup_llm_error_rate),
+        },
+    ).start()
+
+    summaries = []
+    try:
+        for name in args.scenarios.split(","):
+            scenario = SCENARIOS[name.strip()]
+            if args.hot_fraction is not None:
+                scenario.hot_fraction = args.hot_fraction
+            result = asyncio.run(run_scenario(upstreams, scenario, args.concurrency, args.duration))
+            summaries.append(result.summary())
+    finally:
+        upstreams.stop()
+
+    print_table(summaries)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(summaries, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Microbenchmark of per-request payload costs: parsing, copying and serialization.
+
+Each variant turns one Open-Meteo response body into a `/api/weather` JSON
+body, the way a cache miss does, and (separately) serializes an already
+cached payload, the way a hit does:
+
+- `dicts`: the previous path - `json.loads`, nested dict reshaping, a
+  per-request copy, the description added in place, starlette's JSONResponse
+- `dicts+encoder`: the same dicts through FastAPI's `jsonable_encoder`, as
+  for routes that return a plain dict
+- `models`: `server.models` - slotted models parsed from the bytes, shared
+  between requests and rendered with `dumps` (orjson)
+- `models+stdlib`: the models with the stdlib fallback encoder, used only
+  when orjson is missing
+
+Reported per operation: mean time and the peak bytes allocated while
+building and rendering the body (tracemalloc).
+
+Usage:
+    python -m benchmarks.payloads
+    python -m benchmarks.payloads --iterations 50000 --batch 50 --json payloads.json
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+from datetime import datetime
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from server import models
+from server.models import Conditions, FastJSONResponse, WeatherResponse, describe
+from .fake_upstreams import _forecast_item
+
+PREDICTION = "Conditions should stay much the same over the next five minutes."
+
+def upstream_body(locations: int) -> bytes:
+    observed = datetime(2026, 1, 1, 12, 0)
+    items = [_forecast_item(40.0 + i / 10, -74.0, observed) for i in range(locations)]
+    return json.dumps(items[0] if locations == 1 else items).encode()
+
+# The previous dict-based path, kept here for comparison
+
+def dict_conditions(body: bytes, locations: List[tuple]) -> List[Dict[str, Any]]:
+    data = json.loads(body)
+    if isinstance(data, dict):
+        data = [data]
+    return [
+        {
+            "location": {
+                "latitude": latitude,
+                "longitude": longitude,
+                "timezone": item.get("timezone", "Unknown"),
+                "utc_offset_seconds": item.get("utc_offset_seconds", 0)
+            },
+            "current": item.get("current", {}),
+            "timestamp": item.get("current", {}).get("time", "")
+        }
+        for (latitude, longitude), item in zip(locations, data)
+    ]
+
+def dict_payload(weather: Dict[str, Any], latitude: float, longitude: float) -> Dict[str, Any]:
+    weather = {
+        **weather,
+        "location": {**weather["location"], "latitude": latitude, "longitude": longitude},
+        "current": dict(weather["current"]),
+    }
+    current = weather["current"]
+    current["description"] = describe(current.get("weather_code", 0))
+    return {
+        "current": current,
+        "prediction": PREDICTION,
+        "location": weather["location"],
+        "timestamp": weather["timestamp"],
+    }
+
+def model_payload(weather: Conditions, latitude: float, longitude: float) -> WeatherResponse:
+    return WeatherResponse(weather.at(latitude, longitude), PREDICTION)
+
+def parse_models(body: bytes, locations: List[tuple]) -> List[Conditions]:
+    data = models.loads(body)
+    if isinstance(data, dict):
+        data = [data]
+    return [Conditions.from_upstream(latitude, longitude, item) for (latitude, longitude), item in zip(locations, data)]
+
+def measure(fn: Callable[[], Any], iterations: int) -> Dict[str, float]:
+    for _ in range(min(iterations, 1000)):
+        fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+
+    # One traced call; tracemalloc slows every allocation down
+    tracemalloc.start()
+    fn()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return {"us": elapsed / iterations * 1e6, "alloc_bytes": peak - before}
+
+def run(iterations: int, batch: int) -> List[dict]:
+    body = upstream_body(batch)
+    locations = [(40.0 + i / 10, -74.0) for i in range(batch)]
+    cached_dicts = dict_conditions(body, locations)
+    cached_models = parse_models(body, locations)
+
+    def miss_dicts():
+        weather = dict_conditions(body, locations)
+        return JSONResponse({"results": [dict_payload(w, lat, lon) for w, (lat, lon) in zip(weather, locations)]}).body
+
+    def miss_models():
+        weather = parse_models(body, locations)
+        return FastJSONResponse({"results": [model_payload(w, lat, lon) for w, (lat, lon) in zip(weather, locations)]}).body
+
+    def hit_dicts():
+        return JSONResponse({"results": [dict_payload(w, lat, lon) for w, (lat, lon) in zip(cached_dicts, locations)]}).body
+
+    def hit_dicts_encoder():
+        content = {"results": [dict_payload(w, lat, lon) for w, (lat, lon) in zip(cached_dicts, locations)]}
+        return JSONResponse(jsonable_encoder(content)).body
+
+    def hit_models():
+        return FastJSONResponse({"results": [model_payload(w, lat, lon) for w, (lat, lon) in zip(cached_models, locations)]}).body
+
+    def hit_models_stdlib():
+        orjson, models.orjson = models.orjson, None
+        try:
+            return hit_models()
+        finally:
+            models.orjson = orjson
+
+    variants = [
+        ("miss", "dicts", miss_dicts),
+        ("miss", "models", miss_models),
+        ("hit", "dicts", hit_dicts),
+        ("hit", "dicts+encoder", hit_dicts_encoder),
+        ("hit", "models", hit_models),
+        ("hit", "models+stdlib", hit_models_stdlib),
+    ]
+    return [
+        {"path": path, "variant": name, "locations": batch, **measure(fn, iterations)}
+        for path, name, fn in variants
+    ]
+
+def print_table(rows: List[dict]):
+    print(f"orjson: {'on' if models.orjson is not None else 'off (stdlib fallback)'}")
+    columns = ["path", "variant", "locations", "us", "alloc_bytes"]
+    print(" ".join(f"{column:>14}" for column in columns))
+    for row in rows:
+        print(" ".join(
+            f"{row[column]:>14.1f}" if isinstance(row[column], float) else f"{str(row[column]):>14}"
+            for column in columns
+        ))
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000, help="Operations timed per variant")
+    parser.add_argument("--batch", default="1,50", help="Comma-separated locations per payload")
+    parser.add_argument("--json", dest="json_path", help="Write the rows to this file")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for batch in (int(value) for value in args.batch.split(",")):
+        # Keep the total work per variant roughly constant
+        rows += run(max(args.iterations // batch, 100), batch)
+    print_table(rows)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
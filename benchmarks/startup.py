@@ -0,0 +1,123 @@
+"""
+Measure cold-start time of app:app against local fake upstreams.
+
+For each warm-up mode the app is started in a fresh uvicorn subprocess and
+timed from spawn until it first answers `/` (listening) and until `/`
+reports ready, followed by the latency of the first `/api/weather` request.
+The import time of `app` is measured separately in a fresh interpreter.
+
+Usage:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --modes off,blocking --runs 5
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+import aiohttp
+
+from .fake_upstreams import FakeUpstreams, LatencyProfile
+from .load_test import REPO_ROOT, Scenario, _free_port, start_app
+
+MODES = ("off", "background", "blocking")
+
+IMPORT_SCRIPT = "import time; start = time.perf_counter(); import app; print(time.perf_counter() - start)"
+
+def measure_import() -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+async def measure_start(upstreams: FakeUpstreams, mode: str, timeout: float = 60.0) -> Dict[str, float]:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    # The default location, so a warmed cache can serve the first request
+    scenario = Scenario(mode, env={
+        "WARMUP_MODE": mode,
+        "WARMUP_LOCATIONS": "40.7128,-74.006",
+        "WARMUP_PREDICTIONS": "true",
+        "NOWCAST_MODE": "llm",
+    })
+    spawned = time.perf_counter()
+    process = start_app(upstreams, scenario, port)
+    listening = ready = None
+    try:
+        async with aiohttp.ClientSession() as session:
+            while ready is None:
+                if time.perf_counter() - spawned > timeout:
+                    raise RuntimeError(f"App did not become ready at {base_url}")
+                try:
+                    async with session.get(f"{base_url}/") as response:
+                        now = time.perf_counter()
+                        listening = listening or now
+                        if response.status == 200:
+                            ready = now
+                except aiohttp.ClientError:
+                    pass
+                if ready is None:
+                    await asyncio.sleep(0.02)
+            upstreams.reset()
+            start = time.perf_counter()
+            async with session.get(f"{base_url}/api/weather") as response:
+                await response.read()
+                status = response.status
+            first_request = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return {
+        "listening_s": listening - spawned,
+        "ready_s": ready - spawned,
+        "first_request_ms": first_request * 1000,
+        "first_request_status": status,
+        "first_request_upstream_calls": sum(upstreams.calls.values()),
+    }
+
+def summarize(mode: str, runs: List[Dict[str, float]]) -> dict:
+    summary = {"mode": mode, "runs": len(runs)}
+    for key in ("listening_s", "ready_s", "first_request_ms", "first_request_upstream_calls"):
+        summary[key] = round(statistics.median(run[key] for run in runs), 3)
+    return summary
+
+def print_table(imports: List[float], summaries: List[dict]):
+    print(f"import app: median {statistics.median(imports):.3f}s over {len(imports)} runs")
+    columns = ["mode", "runs", "listening_s", "ready_s", "first_request_ms", "first_request_upstream_calls"]
+    print(" ".join(f"{column:>14}" for column in columns))
+    for summary in summaries:
+        print(" ".join(f"{str(summary[column]):>14}" for column in columns))
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma-separated warm-up modes")
+    parser.add_argument("--runs", type=int, default=3, help="Starts per mode; medians are reported")
+    parser.add_argument("--weather-latency-ms", type=float, default=80.0, help="Median Open-Meteo latency")
+    parser.add_argument("--llm-latency-ms", type=float, default=1500.0, help="Median serving-endpoint latency")
+    parser.add_argument("--json", dest="json_path", help="Write the summaries to this file")
+    args = parser.parse_args(argv)
+
+    upstreams = FakeUpstreams(
+        weather=LatencyProfile(args.weather_latency_ms),
+        llm=LatencyProfile(args.llm_latency_ms),
+    ).start()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    summaries = []
+    try:
+        for mode in args.modes.split(","):
+            runs = [asyncio.run(measure_start(upstreams, mode.strip())) for _ in range(args.runs)]
+            summaries.append(summarize(mode.strip(), runs))
+    finally:
+        upstreams.stop()
+
+    print_table(imports, summaries)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"import_s": statistics.median(imports), "modes": summaries}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -48,10 +48,31 @@ function App() {
   }
 
   useEffect(() => {
-    fetchWeather()
-    // Auto-refresh every 2 minutes
-    const interval = setInterval(fetchWeather, 120000)
-    return () => clearInterval(interval)
+    if (!('EventSource' in window)) {
+      fetchWeather()
+      // Auto-refresh every 2 minutes
+      const interval = setInterval(fetchWeather, 120000)
+      return () => clearInterval(interval)
+    }
+
+    // Server pushes an update whenever the observation or prediction changes
+    setLoading(true)
+    const source = new EventSource(`/api/weather/subscribe?lat=${location.lat}&lon=${location.lon}`)
+    let received = false
+    source.addEventListener('weather', (event) => {
+      received = true
+      setWeather(JSON.parse((event as MessageEvent).data))
+      setError(null)
+      setLoading(false)
+    })
+    source.onerror = () => {
+      // EventSource reconnects on its own; only surface errors before the first update
+      if (!received) {
+        setLoading(false)
+        setError('Lost connection to weather updates')
+      }
+    }
+    return () => source.close()
   }, [location])
 
   const useCurrentLocation = () => {
@@ -0,0 +1,265 @@
+"""Admission control: adaptive concurrency limit with a fair, bounded priority queue."""
+import asyncio
+import heapq
+import itertools
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+from .config import (
+    ADMISSION_ENABLED,
+    ADMISSION_INITIAL_LIMIT,
+    ADMISSION_MIN_LIMIT,
+    ADMISSION_MAX_LIMIT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_MAX_QUEUE_PER_CLIENT,
+    ADMISSION_MAX_QUEUE_MS,
+    ADMISSION_LATENCY_TOLERANCE,
+)
+from .metrics import stage
+from .resilience import remaining
+
+# Priority classes; lower is served first
+INTERACTIVE, BACKGROUND = 0, 1
+
+_client: ContextVar[str] = ContextVar("admission_client", default="anonymous")
+_priority: ContextVar[int] = ContextVar("admission_priority", default=INTERACTIVE)
+
+# Headers Databricks Apps sets for the signed-in user, checked in order
+CLIENT_HEADERS = (b"x-forwarded-email", b"x-forwarded-user", b"x-real-ip")
+
+class Overloaded(Exception):
+    """The request was shed instead of queued for an upstream slot."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Shed by admission control: {reason}")
+        self.reason = reason
+
+@contextmanager
+def request_priority(level: int) -> Iterator[None]:
+    """Run the enclosed work (and tasks it starts) at `level`."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+class Ticket:
+    """A held slot; `release` it exactly once with the call's outcome."""
+
+    __slots__ = ("controller", "client", "started", "released")
+
+    def __init__(self, controller: "AdmissionController", client: str):
+        self.controller = controller
+        self.client = client
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self, error: Optional[BaseException] = None, latency: Optional[float] = None):
+        """`latency` overrides the time held (e.g. time to first token of a stream)."""
+        if not self.released:
+            self.released = True
+            if latency is None:
+                latency = time.monotonic() - self.started
+            self.controller._release(self.client, latency, error)
+
+class AdmissionController:
+    """
+    Caps concurrent upstream calls at an adaptive limit and queues the rest.
+
+    The limit grows by about one per limit's worth of successful calls while
+    it is fully used (additive increase) and shrinks by 30% on an overload
+    signal (`is_overload`, e.g. 429 or timeout) or by 10% when latency rises
+    above `latency_tolerance` times the fastest recent call; decreases are
+    at most once per second.
+
+    Waiting calls are served by priority class, then by how many calls their
+    client already had running or queued, then in arrival order, so one busy
+    client cannot starve the others. Calls are shed with Overloaded instead
+    of queued when the queue or the client's share of it is full, and when
+    they wait longer than `max_queue_wait` or half the remaining deadline.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: float = ADMISSION_INITIAL_LIMIT,
+        min_limit: float = ADMISSION_MIN_LIMIT,
+        max_limit: float = ADMISSION_MAX_LIMIT,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        max_queue_per_client: int = ADMISSION_MAX_QUEUE_PER_CLIENT,
+        max_queue_wait: float = ADMISSION_MAX_QUEUE_MS / 1000,
+        latency_tolerance: float = ADMISSION_LATENCY_TOLERANCE,
+        is_overload: Callable[[BaseException], bool] = lambda e: False,
+        enabled: bool = ADMISSION_ENABLED,
+    ):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.max_queue_per_client = max_queue_per_client
+        self.max_queue_wait = max_queue_wait
+        self.latency_tolerance = latency_tolerance
+        self.is_overload = is_overload
+        self.enabled = enabled
+        self.in_flight = 0
+        self.queued = 0
+        self._heap: List[list] = []
+        self._seq = itertools.count()
+        self._active_by_client: Counter = Counter()
+        self._queued_by_client: Counter = Counter()
+        self._latencies: deque = deque(maxlen=100)
+        self._last_decrease = 0.0
+        self.admitted = 0
+        self.waited = 0
+        self.shed: Counter = Counter()
+        self.increases = 0
+        self.decreases = 0
+
+    async def acquire(self) -> Ticket:
+        """Wait for a slot; raises Overloaded when the call is shed."""
+        client = _client.get()
+        if self.in_flight < int(self.limit) and not self.queued:
+            return self._admit(client)
+        if self.queued >= self.max_queue:
+            raise self._shed("queue_full")
+        if self._queued_by_client[client] >= self.max_queue_per_client:
+            raise self._shed("client_queue_full")
+        left = remaining()
+        wait = self.max_queue_wait if left is None else min(self.max_queue_wait, left / 2)
+        if wait <= 0:
+            raise self._shed("deadline")
+
+        future = asyncio.get_running_loop().create_future()
+        load = self._active_by_client[client] + self._queued_by_client[client]
+        heapq.heappush(self._heap, [_priority.get(), load, next(self._seq), future, client])
+        self.queued += 1
+        self._queued_by_client[client] += 1
+        self.waited += 1
+        try:
+            with stage("queue"):
+                await asyncio.wait_for(future, wait)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # Granted a slot just as the caller gave up; pass it on
+                self.in_flight -= 1
+                self._dispatch()
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._shed("queue_timeout") from None
+            raise
+        finally:
+            self.queued -= 1
+            self._queued_by_client[client] -= 1
+            if not self._queued_by_client[client]:
+                del self._queued_by_client[client]
+            if len(self._heap) > 2 * self.max_queue:
+                # Drop entries of callers that stopped waiting
+                self._heap = [entry for entry in self._heap if not entry[3].done()]
+                heapq.heapify(self._heap)
+        # _dispatch already counted the slot as in flight
+        self._active_by_client[client] += 1
+        return Ticket(self, client)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if not self.enabled:
+            yield
+            return
+        ticket = await self.acquire()
+        try:
+            yield
+        except BaseException as e:
+            ticket.release(e)
+            raise
+        ticket.release()
+
+    def _admit(self, client: str) -> Ticket:
+        self.in_flight += 1
+        self._active_by_client[client] += 1
+        self.admitted += 1
+        return Ticket(self, client)
+
+    def _shed(self, reason: str) -> Overloaded:
+        self.shed[reason] += 1
+        return Overloaded(reason)
+
+    def _release(self, client: str, latency: float, error: Optional[BaseException]):
+        self.in_flight -= 1
+        self._active_by_client[client] -= 1
+        if not self._active_by_client[client]:
+            del self._active_by_client[client]
+        if not isinstance(error, asyncio.CancelledError):
+            self._adapt(latency, error)
+        self._dispatch()
+
+    def _adapt(self, latency: float, error: Optional[BaseException]):
+        now = time.monotonic()
+        if error is not None and self.is_overload(error):
+            self._decrease(now, 0.7)
+            return
+        if error is not None:
+            return
+        self._latencies.append(latency)
+        baseline = min(self._latencies)
+        if len(self._latencies) >= 10 and latency > baseline * self.latency_tolerance:
+            self._decrease(now, 0.9)
+        elif self.in_flight + 1 >= int(self.limit) and self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.increases += 1
+
+    def _decrease(self, now: float, factor: float):
+        if now - self._last_decrease < 1.0:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * factor)
+        self.decreases += 1
+
+    def _dispatch(self):
+        while self._heap and self.in_flight < int(self.limit):
+            future = heapq.heappop(self._heap)[3]
+            if future.done():
+                continue
+            self.in_flight += 1
+            self.admitted += 1
+            future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "waited": self.waited,
+            "shed": dict(self.shed),
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "min_latency_ms": round(min(self._latencies) * 1000, 1) if self._latencies else None,
+        }
+
+class ClientIdentityMiddleware:
+    """ASGI middleware that tags each request with its client for fair queueing."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _client.set(client_id(scope))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _client.reset(token)
+
+def client_id(scope) -> str:
+    headers = dict(scope.get("headers") or [])
+    for name in CLIENT_HEADERS:
+        value = headers.get(name)
+        if value:
+            return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "anonymous"
@@ -0,0 +1,109 @@
+"""Micro-batching: collect calls arriving within a short window into one upstream call."""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+from .resilience import budget
+
+logger = logging.getLogger(__name__)
+
+# (items, timeout) -> one result per item, in order; ValueError if the answer is unusable
+BatchCall = Callable[[List[Any], float], Awaitable[List[Any]]]
+# (item, timeout) -> result
+SingleCall = Callable[[Any, float], Awaitable[Any]]
+
+class MicroBatcher:
+    """
+    Groups `submit` calls with the same group key (e.g. the model) that arrive
+    within `window` seconds, up to `max_size` per batch, and runs them as one
+    `call_batch`. A batch of one uses `call_single`.
+
+    If `call_batch` raises ValueError (a malformed answer) every item is
+    retried with `call_single`. Any other error is passed to all callers.
+    The batch timeout is the tightest of its callers' remaining budgets.
+    """
+
+    def __init__(
+        self,
+        call_batch: BatchCall,
+        call_single: SingleCall,
+        window: float,
+        max_size: int,
+        timeout_cap: float,
+    ):
+        self.call_batch = call_batch
+        self.call_single = call_single
+        self.window = window
+        self.max_size = max_size
+        self.timeout_cap = timeout_cap
+        self._pending: Dict[Hashable, List[Tuple[Any, float, asyncio.Future]]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._running: set = set()
+        self.batches = 0
+        self.batched_items = 0
+        self.fallbacks = 0
+
+    async def submit(self, group: Hashable, item: Any) -> Any:
+        expires_at = time.monotonic() + budget(1.0, self.timeout_cap)
+        future = asyncio.get_running_loop().create_future()
+        batch = self._pending.setdefault(group, [])
+        batch.append((item, expires_at, future))
+        if len(batch) >= self.max_size:
+            self._flush(group)
+        elif len(batch) == 1:
+            self._timers[group] = asyncio.get_running_loop().call_later(self.window, self._flush, group)
+        return await future
+
+    def _flush(self, group: Hashable):
+        timer = self._timers.pop(group, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(group, None)
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: List[Tuple[Any, float, asyncio.Future]]):
+        items = [item for item, _, _ in batch]
+        futures = [future for _, _, future in batch]
+        timeout = min(expires_at for _, expires_at, _ in batch) - time.monotonic()
+        self.batches += 1
+        self.batched_items += len(batch)
+        try:
+            if len(batch) == 1:
+                results = [await self.call_single(items[0], timeout)]
+            else:
+                try:
+                    results = await self.call_batch(items, timeout)
+                except ValueError as e:
+                    self.fallbacks += 1
+                    logger.warning("Batched call of %d items unusable (%s); calling individually", len(items), e)
+                    results = await asyncio.gather(
+                        *[self.call_single(item, expires_at - time.monotonic()) for item, expires_at, _ in batch],
+                        return_exceptions=True,
+                    )
+        except BaseException as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        for future, result in zip(futures, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "batched_items": self.batched_items,
+            "mean_batch_size": round(self.batched_items / self.batches, 2) if self.batches else 0.0,
+            "fallbacks": self.fallbacks,
+            "pending": sum(len(batch) for batch in self._pending.values()),
+        }
@@ -0,0 +1,326 @@
+"""
+Bulk predictions for a list of locations, outside the HTTP API.
+
+Reads locations from CSV (`latitude`/`longitude` or `lat`/`lon` columns) or
+JSONL, fetches weather and predictions in a pipeline with separate
+concurrency limits, and appends one JSON line per location to the output
+as results complete. A checkpoint next to the output lets an interrupted run
+resume where it stopped.
+
+Usage:
+    python -m server.bulk sites.csv --output predictions.jsonl
+    python -m server.bulk sites.jsonl --output predictions.jsonl --fetch-concurrency 16 --predict-concurrency 8
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from .admission import BACKGROUND, request_priority
+from .config import BATCH_PREDICTION_CONCURRENCY
+from .llm import close_llm_client, predict_weather
+from .models import WeatherResponse, dumps
+from .weather import close_session, get_current_weather, start_session
+
+logger = logging.getLogger(__name__)
+
+LATITUDE_FIELDS = ("latitude", "lat")
+LONGITUDE_FIELDS = ("longitude", "lon", "lng")
+
+def read_locations(path: str, fmt: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Input records one at a time, from CSV or JSONL (by extension unless `fmt` is given)."""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    with open(path, newline="") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def coordinates(record: Dict[str, Any]) -> Tuple[float, float]:
+    """(latitude, longitude) from an input record; ValueError if missing or out of range."""
+    def field(names) -> float:
+        for name in names:
+            if record.get(name) not in (None, ""):
+                return float(record[name])
+        raise ValueError(f"missing {names[0]}")
+
+    latitude, longitude = field(LATITUDE_FIELDS), field(LONGITUDE_FIELDS)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError(f"coordinates out of range: {latitude}, {longitude}")
+    return latitude, longitude
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"count": 0, "mean_ms": None, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+    ordered = sorted(values)
+
+    def at(pct: float) -> float:
+        index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+        return round(ordered[index] * 1000, 1)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 1),
+        "p50_ms": at(50),
+        "p95_ms": at(95),
+        "p99_ms": at(99),
+    }
+
+class Checkpoint:
+    """
+    Which input rows are finished, and how much of the output belongs to them.
+
+    Rows complete out of order, so progress is a watermark (every row below
+    it is done) plus the finished rows above it. `output_bytes` is the output
+    size when the checkpoint was written; on resume the output is truncated
+    back to it, so lines of rows not covered by the checkpoint are not
+    duplicated when those rows run again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.watermark = 0
+        self.done: Set[int] = set()
+        self.output_bytes = 0
+        self.counts: Dict[str, int] = {"ok": 0, "errors": 0}
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            state = json.load(f)
+        self.watermark = state["watermark"]
+        self.done = set(state["done"])
+        self.output_bytes = state["output_bytes"]
+        self.counts = state["counts"]
+        return True
+
+    def is_done(self, index: int) -> bool:
+        return index < self.watermark or index in self.done
+
+    def mark(self, index: int):
+        self.done.add(index)
+        while self.watermark in self.done:
+            self.done.remove(self.watermark)
+            self.watermark += 1
+
+    def save(self, output_bytes: int):
+        self.output_bytes = output_bytes
+        state = {
+            "watermark": self.watermark,
+            "done": sorted(self.done),
+            "output_bytes": output_bytes,
+            "counts": self.counts,
+            "saved_at": time.time(),
+        }
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+class BulkRunner:
+    """
+    Producer/consumer pipeline: read -> fetch weather -> predict -> write.
+
+    Each stage has its own worker pool joined by bounded queues, so the input
+    is streamed and a slow prediction stage does not stop weather fetches
+    from running ahead (up to the queue size). Weather failures are retried
+    with backoff and then written as an `error` line; predictions degrade
+    instead of failing. Output lines carry the input row `index` and are in
+    completion order.
+    """
+
+    def __init__(
+        self,
+        input_path: str,
+        output_path: str,
+        input_format: Optional[str] = None,
+        fetch_concurrency: int = 8,
+        predict_concurrency: int = BATCH_PREDICTION_CONCURRENCY,
+        retries: int = 2,
+        checkpoint_every: int = 100,
+        checkpoint_seconds: float = 5.0,
+        restart: bool = False,
+    ):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.input_format = input_format
+        self.fetch_concurrency = fetch_concurrency
+        self.predict_concurrency = predict_concurrency
+        self.retries = retries
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_seconds = checkpoint_seconds
+        self.restart = restart
+        self.checkpoint = Checkpoint(f"{output_path}.checkpoint")
+        self.latencies: Dict[str, List[float]] = {"fetch": [], "predict": [], "item": []}
+        self.processed = 0
+        self.skipped = 0
+        self._out = None
+        self._unsaved = 0
+        self._last_save = 0.0
+
+    async def run(self) -> Dict[str, Any]:
+        resumed = not self.restart and self.checkpoint.load()
+        if resumed:
+            self._out = open(self.output_path, "r+b")
+            self._out.truncate(self.checkpoint.output_bytes)
+            self._out.seek(self.checkpoint.output_bytes)
+            logger.info("Resuming: %d rows already done", self.checkpoint.watermark + len(self.checkpoint.done))
+        else:
+            self._out = open(self.output_path, "wb")
+
+        fetch_queue: asyncio.Queue = asyncio.Queue(maxsize=self.fetch_concurrency * 2)
+        predict_queue: asyncio.Queue = asyncio.Queue(maxsize=self.predict_concurrency * 2)
+        write_queue: asyncio.Queue = asyncio.Queue(maxsize=self.predict_concurrency * 2)
+        started = time.perf_counter()
+        await start_session()
+        tasks: List[asyncio.Task] = []
+        try:
+            with request_priority(BACKGROUND):
+                producer = asyncio.ensure_future(self._produce(fetch_queue, write_queue))
+                fetchers = [asyncio.ensure_future(self._fetch(fetch_queue, predict_queue, write_queue)) for _ in range(self.fetch_concurrency)]
+                predictors = [asyncio.ensure_future(self._predict(predict_queue, write_queue)) for _ in range(self.predict_concurrency)]
+                writer = asyncio.ensure_future(self._write(write_queue))
+            tasks = [producer, *fetchers, *predictors, writer]
+
+            # Shut the stages down in order once the one before has drained
+            await producer
+            for _ in fetchers:
+                await fetch_queue.put(None)
+            await asyncio.gather(*fetchers)
+            for _ in predictors:
+                await predict_queue.put(None)
+            await asyncio.gather(*predictors)
+            await write_queue.put(None)
+            await writer
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._save()
+            self._out.close()
+            await close_session()
+            await close_llm_client()
+
+        return self.report(time.perf_counter() - started, resumed)
+
+    async def _produce(self, fetch_queue: asyncio.Queue, write_queue: asyncio.Queue):
+        for index, record in enumerate(read_locations(self.input_path, self.input_format)):
+            if self.checkpoint.is_done(index):
+                self.skipped += 1
+                continue
+            try:
+                location = coordinates(record)
+            except (TypeError, ValueError) as e:
+                await write_queue.put((index, record, {"error": f"invalid location: {e}"}, 0.0))
+                continue
+            await fetch_queue.put((index, record, location, time.perf_counter()))
+
+    async def _fetch(self, fetch_queue: asyncio.Queue, predict_queue: asyncio.Queue, write_queue: asyncio.Queue):
+        while (item := await fetch_queue.get()) is not None:
+            index, record, (latitude, longitude), queued = item
+            start = time.perf_counter()
+            for attempt in range(self.retries + 1):
+                try:
+                    weather = await get_current_weather(latitude, longitude)
+                    break
+                except Exception as e:
+                    if attempt == self.retries:
+                        await write_queue.put((index, record, {"error": str(e) or type(e).__name__}, queued))
+                        weather = None
+                    else:
+                        await asyncio.sleep(0.5 * 2 ** attempt)
+            self.latencies["fetch"].append(time.perf_counter() - start)
+            if weather is not None:
+                await predict_queue.put((index, record, weather, queued))
+
+    async def _predict(self, predict_queue: asyncio.Queue, write_queue: asyncio.Queue):
+        while (item := await predict_queue.get()) is not None:
+            index, record, weather, queued = item
+            start = time.perf_counter()
+            prediction = await predict_weather(weather.current, weather.location)
+            self.latencies["predict"].append(time.perf_counter() - start)
+            await write_queue.put((index, record, WeatherResponse(weather, prediction).to_json(), queued))
+
+    async def _write(self, write_queue: asyncio.Queue):
+        while (item := await write_queue.get()) is not None:
+            index, record, result, queued = item
+            line = {"index": index, "input": record, **result}
+            self._out.write(dumps(line) + b"\n")
+            self.checkpoint.mark(index)
+            self.checkpoint.counts["errors" if "error" in result else "ok"] += 1
+            self.processed += 1
+            if queued:
+                self.latencies["item"].append(time.perf_counter() - queued)
+            self._unsaved += 1
+            if self._unsaved >= self.checkpoint_every or time.monotonic() - self._last_save >= self.checkpoint_seconds:
+                self._save()
+
+    def _save(self):
+        # Output first, so the checkpoint never covers lines that are not on disk
+        self._out.flush()
+        os.fsync(self._out.fileno())
+        self.checkpoint.save(self._out.tell())
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+
+    def report(self, elapsed: float, resumed: bool) -> Dict[str, Any]:
+        return {
+            "resumed": resumed,
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "ok_total": self.checkpoint.counts["ok"],
+            "errors_total": self.checkpoint.counts["errors"],
+            "elapsed_s": round(elapsed, 2),
+            "throughput_per_s": round(self.processed / elapsed, 2) if elapsed else 0.0,
+            "stages": {stage: percentiles(values) for stage, values in self.latencies.items()},
+        }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", help="CSV or JSONL file of locations")
+    parser.add_argument("--output", required=True, help="JSONL file for the results")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="Input format (default: from the extension)")
+    parser.add_argument("--fetch-concurrency", type=int, default=8)
+    parser.add_argument("--predict-concurrency", type=int, default=BATCH_PREDICTION_CONCURRENCY)
+    parser.add_argument("--retries", type=int, default=2, help="Weather fetch retries per location")
+    parser.add_argument("--checkpoint-every", type=int, default=100, help="Results between checkpoints")
+    parser.add_argument("--checkpoint-seconds", type=float, default=5.0, help="Longest time between checkpoints")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and start over")
+    parser.add_argument("--stats-json", help="Also write the final report to this file")
+    args = parser.parse_args(argv)
+    # Progress from this app; only warnings from the HTTP client libraries
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s", stream=sys.stderr)
+    for name in ("server", __name__):
+        logging.getLogger(name).setLevel(logging.INFO)
+
+    runner = BulkRunner(
+        args.input,
+        args.output,
+        input_format=args.format,
+        fetch_concurrency=args.fetch_concurrency,
+        predict_concurrency=args.predict_concurrency,
+        retries=args.retries,
+        checkpoint_every=args.checkpoint_every,
+        checkpoint_seconds=args.checkpoint_seconds,
+        restart=args.restart,
+    )
+    try:
+        report = asyncio.run(runner.run())
+    except KeyboardInterrupt:
+        # run() saved a checkpoint on the way out
+        logger.warning("Interrupted; run the same command again to resume")
+        sys.exit(130)
+    print(json.dumps(report, indent=2))
+    if args.stats_json:
+        with open(args.stats_json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
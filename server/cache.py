@@ -0,0 +1,168 @@
+"""In-process TTL cache with LRU eviction and request coalescing."""
+import asyncio
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, Union
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire after a per-entry TTL.
+
+    Eviction is by entry count and, when `max_bytes` is set, by the total
+    `sizeof` of the cached values.
+
+    `get_or_fetch` coalesces concurrent misses: the first caller starts the
+    upstream fetch as a task and every other caller for the same key awaits
+    that task instead of issuing its own request. The fetch is shielded, so a
+    cancelled caller does not cancel the load for the others.
+
+    `on_set(key, value, ttl)`, when assigned, is called for every stored
+    entry (used to mirror the cache to the persistent store).
+
+    With `shared` set to a SharedCache, misses are looked up in (and loads
+    coalesced through) that cross-process tier before fetching, and entries
+    stored directly with `set` are written to it in the background.
+
+    Both tiers hold JSON; `decode`, when assigned, rebuilds values read back
+    from them (e.g. into model objects).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        name: str = "cache",
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = sys.getsizeof,
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, int]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.stale = 0
+        self.on_set: Optional[Callable[[Hashable, Any, float], None]] = None
+        self.shared = None
+        self.decode: Optional[Callable[[Any], Any]] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a fresh cached value or None, without touching the counters."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, _ = entry
+        if time.monotonic() >= expires_at:
+            # Expired entries stay until evicted so `peek` can serve them stale
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value even if it has expired (degraded fallback)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self.stale += 1
+        return entry[1]
+
+    def lookup(self, key: Hashable) -> Optional[Any]:
+        """Like `get`, but counted as a hit or miss in the stats."""
+        value = self.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float, share: bool = True):
+        if ttl <= 0:
+            return
+        if share and self.shared is not None:
+            self.shared.put_nowait(self.name, key, value, ttl)
+        self.delete(key)
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        self._entries[key] = (time.monotonic() + ttl, value, size)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self.bytes > self.max_bytes and len(self._entries) > 1
+        ):
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+        if self.on_set is not None:
+            self.on_set(key, value, ttl)
+
+    def delete(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    async def get_or_fetch(
+        self,
+        key: Hashable,
+        fetch: Callable[[], Awaitable[Any]],
+        ttl: Union[float, Callable[[Any], float]],
+    ) -> Any:
+        """Return the cached value for `key`, loading it once on a miss."""
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, fetch, ttl))
+            task.add_done_callback(_consume_exception)
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, key, fetch, ttl):
+        try:
+            if self.shared is not None:
+                value, seconds = await self.shared.get_or_fetch(self.name, key, fetch, ttl)
+                if self.decode is not None:
+                    value = self.decode(value)
+                self.set(key, value, seconds, share=False)
+                return value
+            value = await fetch()
+            self.set(key, value, ttl(value) if callable(ttl) else ttl)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "stale": self.stale,
+            "inflight": len(self._inflight),
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+        }
+
+def _consume_exception(task: asyncio.Task):
+    # Avoid "exception was never retrieved" when every waiter was cancelled
+    if not task.cancelled():
+        task.exception()
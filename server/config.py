@@ -1,12 +1,156 @@
 """Configuration and authentication for Databricks Apps."""
+import asyncio
+import logging
 import os
-from databricks.sdk import WorkspaceClient
+import tempfile
+import threading
+import time
+from typing import TYPE_CHECKING, Optional, Tuple
+
+if TYPE_CHECKING:
+    # Imported lazily: the SDK takes over a second to import
+    from databricks.sdk import WorkspaceClient
+
+logger = logging.getLogger(__name__)
 
 # Detect environment
 IS_DATABRICKS_APP = bool(os.environ.get("DATABRICKS_APP_NAME"))
 
-def get_workspace_client() -> WorkspaceClient:
-    """Get authenticated WorkspaceClient."""
+# Open-Meteo HTTP connection pool
+WEATHER_POOL_LIMIT = int(os.environ.get("WEATHER_POOL_LIMIT", "100"))
+WEATHER_POOL_LIMIT_PER_HOST = int(os.environ.get("WEATHER_POOL_LIMIT_PER_HOST", "20"))
+WEATHER_KEEPALIVE_SECONDS = float(os.environ.get("WEATHER_KEEPALIVE_SECONDS", "30"))
+WEATHER_DNS_CACHE_SECONDS = int(os.environ.get("WEATHER_DNS_CACHE_SECONDS", "300"))
+WEATHER_CONNECT_TIMEOUT = float(os.environ.get("WEATHER_CONNECT_TIMEOUT", "3"))
+WEATHER_REQUEST_TIMEOUT = float(os.environ.get("WEATHER_REQUEST_TIMEOUT", "10"))
+
+# Deadlines, hedging and circuit breaking
+REQUEST_DEADLINE_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", "20"))
+WEATHER_BUDGET_SHARE = float(os.environ.get("WEATHER_BUDGET_SHARE", "0.3"))
+LLM_REQUEST_TIMEOUT = float(os.environ.get("LLM_REQUEST_TIMEOUT", "15"))
+WEATHER_HEDGE_ENABLED = os.environ.get("WEATHER_HEDGE_ENABLED", "true").lower() == "true"
+WEATHER_HEDGE_PERCENTILE = float(os.environ.get("WEATHER_HEDGE_PERCENTILE", "95"))
+WEATHER_HEDGE_MIN_DELAY_MS = float(os.environ.get("WEATHER_HEDGE_MIN_DELAY_MS", "50"))
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.environ.get("BREAKER_RESET_SECONDS", "30"))
+
+# Serving endpoints as "name=tier,name=tier" (tier fast or large); unset routes everything to SERVING_ENDPOINT
+SERVING_ENDPOINTS = os.environ.get("SERVING_ENDPOINTS", "")
+ROUTER_EWMA_ALPHA = float(os.environ.get("ROUTER_EWMA_ALPHA", "0.2"))
+ROUTER_ERROR_PENALTY = float(os.environ.get("ROUTER_ERROR_PENALTY", "10"))
+ROUTER_EXPLORE_RATIO = float(os.environ.get("ROUTER_EXPLORE_RATIO", "0.05"))
+
+# Admission control in front of the serving endpoint
+ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_INITIAL_LIMIT = float(os.environ.get("ADMISSION_INITIAL_LIMIT", "16"))
+ADMISSION_MIN_LIMIT = float(os.environ.get("ADMISSION_MIN_LIMIT", "2"))
+ADMISSION_MAX_LIMIT = float(os.environ.get("ADMISSION_MAX_LIMIT", "64"))
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", "256"))
+ADMISSION_MAX_QUEUE_PER_CLIENT = int(os.environ.get("ADMISSION_MAX_QUEUE_PER_CLIENT", "16"))
+ADMISSION_MAX_QUEUE_MS = float(os.environ.get("ADMISSION_MAX_QUEUE_MS", "5000"))
+ADMISSION_LATENCY_TOLERANCE = float(os.environ.get("ADMISSION_LATENCY_TOLERANCE", "2.0"))
+
+# Micro-batched LLM predictions
+LLM_BATCH_ENABLED = os.environ.get("LLM_BATCH_ENABLED", "false").lower() == "true"
+LLM_BATCH_WINDOW_MS = float(os.environ.get("LLM_BATCH_WINDOW_MS", "50"))
+LLM_BATCH_MAX_SIZE = int(os.environ.get("LLM_BATCH_MAX_SIZE", "8"))
+
+# Current-weather cache
+WEATHER_CACHE_ENABLED = os.environ.get("WEATHER_CACHE_ENABLED", "true").lower() == "true"
+WEATHER_CACHE_GRID_DEGREES = float(os.environ.get("WEATHER_CACHE_GRID_DEGREES", "0.05"))
+WEATHER_CACHE_MAX_ENTRIES = int(os.environ.get("WEATHER_CACHE_MAX_ENTRIES", "4096"))
+WEATHER_CACHE_MIN_TTL_SECONDS = float(os.environ.get("WEATHER_CACHE_MIN_TTL_SECONDS", "30"))
+WEATHER_CACHE_DEFAULT_TTL_SECONDS = float(os.environ.get("WEATHER_CACHE_DEFAULT_TTL_SECONDS", "300"))
+
+# Forecast mode: fetch a cell's 15-minute/hourly series once and interpolate current conditions locally
+WEATHER_FORECAST_MODE = os.environ.get("WEATHER_FORECAST_MODE", "false").lower() == "true"
+FORECAST_WINDOW_HOURS = float(os.environ.get("FORECAST_WINDOW_HOURS", "6"))
+FORECAST_WINDOW_TTL_SECONDS = float(os.environ.get("FORECAST_WINDOW_TTL_SECONDS", "10800"))
+FORECAST_STEP_SECONDS = float(os.environ.get("FORECAST_STEP_SECONDS", "300"))
+FORECAST_CACHE_MAX_ENTRIES = int(os.environ.get("FORECAST_CACHE_MAX_ENTRIES", "4096"))
+
+# Batch endpoint
+BATCH_MAX_LOCATIONS = int(os.environ.get("BATCH_MAX_LOCATIONS", "100"))
+BATCH_UPSTREAM_CHUNK_SIZE = int(os.environ.get("BATCH_UPSTREAM_CHUNK_SIZE", "50"))
+BATCH_PREDICTION_CONCURRENCY = int(os.environ.get("BATCH_PREDICTION_CONCURRENCY", "4"))
+
+# Background prediction jobs
+ASYNC_PREDICTIONS = os.environ.get("ASYNC_PREDICTIONS", "false").lower() == "true"
+JOB_TABLE_MAX_ENTRIES = int(os.environ.get("JOB_TABLE_MAX_ENTRIES", "10000"))
+JOB_TTL_SECONDS = float(os.environ.get("JOB_TTL_SECONDS", "300"))
+JOB_MAX_WAIT_SECONDS = float(os.environ.get("JOB_MAX_WAIT_SECONDS", "30"))
+
+# Push subscriptions
+SUBSCRIPTION_MAX_CONNECTIONS = int(os.environ.get("SUBSCRIPTION_MAX_CONNECTIONS", "50000"))
+SUBSCRIPTION_HEARTBEAT_SECONDS = float(os.environ.get("SUBSCRIPTION_HEARTBEAT_SECONDS", "30"))
+SUBSCRIPTION_MIN_REFRESH_SECONDS = float(os.environ.get("SUBSCRIPTION_MIN_REFRESH_SECONDS", "30"))
+SUBSCRIPTION_RETRY_SECONDS = float(os.environ.get("SUBSCRIPTION_RETRY_SECONDS", "15"))
+
+# Background refresh of the most requested cells, serving their expired entry while it runs
+REFRESHER_ENABLED = os.environ.get("REFRESHER_ENABLED", "false").lower() == "true"
+REFRESHER_TOP_K = int(os.environ.get("REFRESHER_TOP_K", "20"))
+REFRESHER_HALF_LIFE_SECONDS = float(os.environ.get("REFRESHER_HALF_LIFE_SECONDS", "600"))
+REFRESHER_MIN_SCORE = float(os.environ.get("REFRESHER_MIN_SCORE", "2"))
+REFRESHER_INTERVAL_SECONDS = float(os.environ.get("REFRESHER_INTERVAL_SECONDS", "5"))
+REFRESHER_MAX_UPSTREAM_RPS = float(os.environ.get("REFRESHER_MAX_UPSTREAM_RPS", "1"))
+REFRESHER_PREDICTIONS = os.environ.get("REFRESHER_PREDICTIONS", "true").lower() == "true"
+REFRESHER_TRACKED_LOCATIONS = int(os.environ.get("REFRESHER_TRACKED_LOCATIONS", "10000"))
+
+# Local nowcaster: "auto" routes calm conditions locally, "llm"/"local" force one path
+NOWCAST_MODE = os.environ.get("NOWCAST_MODE", "auto").lower()
+NOWCAST_MAX_WIND_MPH = float(os.environ.get("NOWCAST_MAX_WIND_MPH", "15"))
+NOWCAST_MAX_TEMP_RATE = float(os.environ.get("NOWCAST_MAX_TEMP_RATE", "0.2"))
+NOWCAST_MAX_CLOUD_RATE = float(os.environ.get("NOWCAST_MAX_CLOUD_RATE", "2"))
+NOWCAST_TRACKED_LOCATIONS = int(os.environ.get("NOWCAST_TRACKED_LOCATIONS", "10000"))
+
+# Prediction cache; bucket widths of 0 compare the field exactly
+PREDICTION_CACHE_ENABLED = os.environ.get("PREDICTION_CACHE_ENABLED", "true").lower() == "true"
+PREDICTION_CACHE_TTL_SECONDS = float(os.environ.get("PREDICTION_CACHE_TTL_SECONDS", "600"))
+PREDICTION_CACHE_MAX_ENTRIES = int(os.environ.get("PREDICTION_CACHE_MAX_ENTRIES", "2048"))
+PREDICTION_CACHE_MAX_BYTES = int(os.environ.get("PREDICTION_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+PREDICTION_BUCKETS = {
+    "temperature_2m": float(os.environ.get("PREDICTION_BUCKET_TEMPERATURE", "1")),
+    "apparent_temperature": float(os.environ.get("PREDICTION_BUCKET_TEMPERATURE", "1")),
+    "relative_humidity_2m": float(os.environ.get("PREDICTION_BUCKET_HUMIDITY", "5")),
+    "wind_speed_10m": float(os.environ.get("PREDICTION_BUCKET_WIND_SPEED", "2")),
+    "wind_direction_10m": float(os.environ.get("PREDICTION_BUCKET_WIND_DIRECTION", "45")),
+    "cloud_cover": float(os.environ.get("PREDICTION_BUCKET_CLOUD_COVER", "10")),
+    "precipitation": float(os.environ.get("PREDICTION_BUCKET_PRECIPITATION", "0.2")),
+    "weather_code": 0,
+}
+
+# Per-location observation history (96 x 15-minute observations = 24 hours)
+HISTORY_CAPACITY = int(os.environ.get("HISTORY_CAPACITY", "96"))
+HISTORY_MAX_LOCATIONS = int(os.environ.get("HISTORY_MAX_LOCATIONS", "10000"))
+
+# Persistent cache store; an empty path disables it
+STORE_PATH = os.environ.get("STORE_PATH", "")
+STORE_FLUSH_SECONDS = float(os.environ.get("STORE_FLUSH_SECONDS", "1"))
+STORE_MAX_BATCH = int(os.environ.get("STORE_MAX_BATCH", "500"))
+
+# Worker processes started by uvicorn (it reads WEB_CONCURRENCY as the --workers default)
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", "1"))
+
+# Cross-process cache shared by the workers; on by default with more than one, "" disables it
+SHARED_CACHE_PATH = os.environ.get(
+    "SHARED_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "weather-app-shared-cache.sqlite3") if WEB_CONCURRENCY > 1 else "",
+)
+SHARED_CACHE_LEASE_SECONDS = float(os.environ.get("SHARED_CACHE_LEASE_SECONDS", "20"))
+SHARED_CACHE_POLL_MS = float(os.environ.get("SHARED_CACHE_POLL_MS", "50"))
+
+# Startup warm-up: "off", "blocking" (before serving) or "background" (while serving)
+WARMUP_MODE = os.environ.get("WARMUP_MODE", "off").lower()
+WARMUP_LOCATIONS = os.environ.get("WARMUP_LOCATIONS", "")  # "lat,lon;lat,lon"
+WARMUP_PREDICTIONS = os.environ.get("WARMUP_PREDICTIONS", "false").lower() == "true"
+WARMUP_TIMEOUT_SECONDS = float(os.environ.get("WARMUP_TIMEOUT_SECONDS", "30"))
+
+# OAuth token caching
+TOKEN_REFRESH_MARGIN_SECONDS = float(os.environ.get("TOKEN_REFRESH_MARGIN_SECONDS", "300"))
+TOKEN_DEFAULT_TTL_SECONDS = float(os.environ.get("TOKEN_DEFAULT_TTL_SECONDS", "3000"))
+
+def _build_workspace_client() -> "WorkspaceClient":
+    from databricks.sdk import WorkspaceClient
     if IS_DATABRICKS_APP:
         # Remote: Uses auto-injected service principal credentials
         return WorkspaceClient()
@@ -15,21 +159,136 @@ def get_workspace_client() -> WorkspaceClient:
         profile = os.environ.get("DATABRICKS_PROFILE", "DEFAULT")
         return WorkspaceClient(profile=profile)
 
+class CredentialManager:
+    """
+    Builds the WorkspaceClient once and caches the bearer token until shortly
+    before it expires.
+
+    The cached state is a single (token, expires_at, version) tuple that is
+    swapped as a whole, so readers never see a token paired with the wrong
+    version. `version` increments whenever the token value changes, which lets
+    dependent clients rebuild themselves only on rotation.
+    """
+
+    def __init__(self, refresh_margin: float = TOKEN_REFRESH_MARGIN_SECONDS):
+        self.refresh_margin = refresh_margin
+        self._client: Optional["WorkspaceClient"] = None
+        self._host: Optional[str] = None
+        self._state: Tuple[str, float, int] = ("", 0.0, 0)
+        self._lock = threading.Lock()
+        self._client_lock = threading.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+
+    def workspace_client(self) -> "WorkspaceClient":
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = _build_workspace_client()
+        return self._client
+
+    def host(self) -> str:
+        if self._host is None:
+            if IS_DATABRICKS_APP:
+                # IMPORTANT: DATABRICKS_HOST in Databricks Apps is just hostname, no scheme
+                host = os.environ.get("DATABRICKS_HOST", "")
+                if host and not host.startswith("http"):
+                    host = f"https://{host}"
+                self._host = host
+            else:
+                self._host = self.workspace_client().config.host  # SDK includes https://
+        return self._host
+
+    def needs_sdk(self) -> bool:
+        """False when an injected app token and host make the Databricks SDK unnecessary."""
+        return not (IS_DATABRICKS_APP and os.environ.get("DATABRICKS_TOKEN"))
+
+    def snapshot(self) -> Tuple[str, int]:
+        """Current (token, version) without touching the SDK."""
+        token, _, version = self._state
+        return token, version
+
+    def _fetch_token(self) -> Tuple[str, float]:
+        if IS_DATABRICKS_APP:
+            # Remote: prefer the static service principal token when injected
+            static_token = os.environ.get("DATABRICKS_TOKEN")
+            if static_token:
+                return static_token, float("inf")
+
+        config = self.workspace_client().config
+        try:
+            oauth = config.oauth_token()
+            if oauth.expiry is not None:
+                return oauth.access_token, oauth.expiry.timestamp()
+            return oauth.access_token, time.time() + TOKEN_DEFAULT_TTL_SECONDS
+        except Exception:
+            # Older SDKs and non-OAuth auth types only expose headers
+            pass
+
+        auth_headers = config.authenticate()
+        token = ""
+        if auth_headers and "Authorization" in auth_headers:
+            token = auth_headers["Authorization"].replace("Bearer ", "")
+        return token, time.time() + TOKEN_DEFAULT_TTL_SECONDS
+
+    def refresh(self, force: bool = False) -> str:
+        """Fetch a new token from the SDK unless another caller just did."""
+        with self._lock:
+            token, expires_at, version = self._state
+            if not force and time.time() < expires_at - self.refresh_margin:
+                return token
+            new_token, new_expires_at = self._fetch_token()
+            if new_token != token:
+                version += 1
+            self._state = (new_token, new_expires_at, version)
+            self.refreshes += 1
+            return new_token
+
+    def get_token(self) -> str:
+        """Cached token; only blocks on the SDK when the token has expired."""
+        token, expires_at, _ = self._state
+        now = time.time()
+        if now >= expires_at:
+            return self.refresh()
+        if now >= expires_at - self.refresh_margin:
+            self._schedule_refresh()
+        return token
+
+    async def get_token_async(self) -> str:
+        """Like `get_token`, but runs any blocking refresh in a worker thread."""
+        token, expires_at, _ = self._state
+        now = time.time()
+        if now >= expires_at:
+            return await asyncio.to_thread(self.refresh)
+        if now >= expires_at - self.refresh_margin:
+            self._schedule_refresh()
+        return token
+
+    def _schedule_refresh(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = loop.create_task(self._background_refresh())
+
+    async def _background_refresh(self):
+        try:
+            await asyncio.to_thread(self.refresh)
+        except Exception:
+            # Keep serving the current token; the next expired call retries inline
+            logger.exception("Background token refresh failed")
+
+credentials = CredentialManager()
+
+def get_workspace_client() -> "WorkspaceClient":
+    """Get authenticated WorkspaceClient."""
+    return credentials.workspace_client()
+
 def get_oauth_token() -> str:
     """Get OAuth token for API authentication."""
-    client = get_workspace_client()
-    auth_headers = client.config.authenticate()
-    if auth_headers and "Authorization" in auth_headers:
-        return auth_headers["Authorization"].replace("Bearer ", "")
-    return ""
+    return credentials.get_token()
 
 def get_workspace_host() -> str:
     """Get workspace host URL with https:// prefix."""
-    if IS_DATABRICKS_APP:
-        # IMPORTANT: DATABRICKS_HOST in Databricks Apps is just hostname, no scheme
-        host = os.environ.get("DATABRICKS_HOST", "")
-        if host and not host.startswith("http"):
-            host = f"https://{host}"
-        return host
-    client = get_workspace_client()
-    return client.config.host  # SDK includes https://
+    return credentials.host()
@@ -0,0 +1,176 @@
+"""Prefetched Open-Meteo forecast windows, interpolated locally into current conditions."""
+import math
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from .config import FORECAST_WINDOW_HOURS, FORECAST_STEP_SECONDS
+from .models import Conditions, Location, Observation
+
+# Series requested per cell; minutely_15 lacks cloud cover and pressure, so those come hourly
+MINUTELY_FIELDS = (
+    "temperature_2m",
+    "relative_humidity_2m",
+    "apparent_temperature",
+    "precipitation",
+    "weather_code",
+    "wind_speed_10m",
+    "wind_direction_10m",
+)
+HOURLY_FIELDS = ("cloud_cover", "surface_pressure")
+
+# Decimals of each field as Open-Meteo reports it (0 -> int)
+FIELD_DECIMALS = {
+    "temperature_2m": 1,
+    "relative_humidity_2m": 0,
+    "apparent_temperature": 1,
+    "precipitation": 2,
+    "weather_code": 0,
+    "wind_speed_10m": 1,
+    "wind_direction_10m": 0,
+    "cloud_cover": 0,
+    "surface_pressure": 1,
+}
+
+# Categorical fields take the nearest sample instead of a blend
+NEAREST_FIELDS = {"weather_code"}
+# Angles are blended along the shorter arc
+CIRCULAR_FIELDS = {"wind_direction_10m"}
+
+# Minutes ahead of the derived `current` that are added as `forecast_5m`
+FORECAST_HORIZON_MINUTES = 5
+
+def forecast_params(hours: float = FORECAST_WINDOW_HOURS) -> Dict[str, Any]:
+    """Open-Meteo query parameters for a window from the last step to `hours` ahead."""
+    return {
+        "minutely_15": ",".join(MINUTELY_FIELDS),
+        "hourly": ",".join(HOURLY_FIELDS),
+        "past_minutely_15": 1,
+        "forecast_minutely_15": int(math.ceil(hours * 4)) + 1,
+        "past_hours": 1,
+        "forecast_hours": int(math.ceil(hours)) + 1,
+        "timeformat": "unixtime",
+    }
+
+class Series:
+    """Epoch-second sample times and a float32 column per field (NaN when missing)."""
+
+    __slots__ = ("fields", "times", "values")
+
+    def __init__(self, fields: Tuple[str, ...], block: Dict[str, Any]):
+        self.fields = fields
+        self.times = np.asarray(block.get("time") or [], dtype=np.int64)
+        self.values = np.full((len(self.times), len(fields)), np.nan, dtype=np.float32)
+        for column, field in enumerate(fields):
+            samples = block.get(field)
+            if samples is not None and len(samples) == len(self.times):
+                self.values[:, column] = np.array(samples, dtype=np.float64)
+        if len(self.times) < 2:
+            raise ValueError("forecast series needs at least two samples")
+
+    @property
+    def nbytes(self) -> int:
+        return self.times.nbytes + self.values.nbytes
+
+    def at(self, epoch: float) -> Dict[str, Optional[float]]:
+        """Every field at `epoch`, blended between the two surrounding samples."""
+        i = int(np.clip(np.searchsorted(self.times, epoch, side="right") - 1, 0, len(self.times) - 2))
+        t0, t1 = self.times[i], self.times[i + 1]
+        weight = float(np.clip((epoch - t0) / (t1 - t0), 0.0, 1.0))
+        before, after = self.values[i].astype(np.float64), self.values[i + 1].astype(np.float64)
+        blended = before + weight * (after - before)
+        nearest = after if weight >= 0.5 else before
+        # A missing neighbour falls back to the other one
+        blended = np.where(np.isnan(blended), nearest, blended)
+
+        values = {}
+        for column, field in enumerate(self.fields):
+            value = blended[column]
+            if field in NEAREST_FIELDS:
+                value = nearest[column]
+            elif field in CIRCULAR_FIELDS and not (np.isnan(before[column]) or np.isnan(after[column])):
+                turn = (after[column] - before[column] + 180) % 360 - 180
+                value = (before[column] + weight * turn) % 360
+            values[field] = _reported(field, value)
+        return values
+
+class ForecastWindow:
+    """
+    One grid cell's forecast: the 15-minute and hourly series as compact
+    numeric arrays, plus the location metadata needed to build responses.
+
+    `snapshot` derives Conditions like those of a `current` fetch for any
+    moment the window covers, so the cell needs no upstream request until
+    the window is refreshed.
+    """
+
+    __slots__ = ("location", "minutely", "hourly", "fetched_at")
+
+    def __init__(self, location: Location, minutely: Series, hourly: Series, fetched_at: float):
+        self.location = location
+        self.minutely = minutely
+        self.hourly = hourly
+        self.fetched_at = fetched_at
+
+    @classmethod
+    def from_response(cls, latitude: float, longitude: float, item: Dict[str, Any]) -> "ForecastWindow":
+        """Parse one Open-Meteo location object; ValueError when a series is missing."""
+        location = Location(latitude, longitude, item.get("timezone", "Unknown"), item.get("utc_offset_seconds", 0))
+        return cls(
+            location,
+            Series(MINUTELY_FIELDS, item.get("minutely_15") or {}),
+            Series(HOURLY_FIELDS, item.get("hourly") or {}),
+            time.time(),
+        )
+
+    @property
+    def start(self) -> int:
+        return int(max(self.minutely.times[0], self.hourly.times[0]))
+
+    @property
+    def end(self) -> int:
+        return int(min(self.minutely.times[-1], self.hourly.times[-1]))
+
+    @property
+    def nbytes(self) -> int:
+        return self.minutely.nbytes + self.hourly.nbytes
+
+    def covers(self, now: float, horizon_minutes: float = FORECAST_HORIZON_MINUTES) -> bool:
+        return self.start <= now and now + horizon_minutes * 60 <= self.end
+
+    def values_at(self, epoch: float) -> Dict[str, Optional[float]]:
+        return {**self.minutely.at(epoch), **self.hourly.at(epoch)}
+
+    def observation_at(self, epoch: float, step: float) -> Observation:
+        local = datetime.fromtimestamp(epoch + self.location.utc_offset_seconds, timezone.utc).replace(tzinfo=None)
+        return Observation(local.isoformat(timespec="minutes"), int(step), **self.values_at(epoch))
+
+    def snapshot(self, now: Optional[float] = None, step: float = FORECAST_STEP_SECONDS) -> Conditions:
+        """
+        Conditions at `now` (floored to `step`, which becomes `interval`) with
+        `forecast_5m`, the conditions FORECAST_HORIZON_MINUTES later.
+        """
+        now = time.time() if now is None else now
+        observed = now // step * step
+        current = self.observation_at(observed, step)
+        current.forecast_5m = self.observation_at(observed + FORECAST_HORIZON_MINUTES * 60, step)
+        return Conditions(self.location, current)
+
+def window_ttl(window: ForecastWindow, max_ttl: float, now: Optional[float] = None) -> float:
+    """Refresh after `max_ttl`, or sooner when the window would stop covering the horizon."""
+    now = time.time() if now is None else now
+    return max(min(max_ttl, window.end - FORECAST_HORIZON_MINUTES * 60 - now), 0.0)
+
+def parse_windows(locations: List[Tuple[float, float]], data: Any) -> List[ForecastWindow]:
+    # Open-Meteo answers a single coordinate with an object, several with a list
+    if isinstance(data, dict):
+        data = [data]
+    if len(data) != len(locations):
+        raise ValueError(f"{len(data)} forecast results for {len(locations)} locations")
+    return [ForecastWindow.from_response(lat, lon, item) for (lat, lon), item in zip(locations, data)]
+
+def _reported(field: str, value: float) -> Optional[float]:
+    if np.isnan(value):
+        return None
+    decimals = FIELD_DECIMALS.get(field, 1)
+    return int(round(float(value))) if decimals == 0 else round(float(value), decimals)
@@ -0,0 +1,179 @@
+"""Fixed-size per-location observation history with vectorized trend statistics."""
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+import numpy as np
+from .config import HISTORY_CAPACITY, HISTORY_MAX_LOCATIONS
+from .models import Observation
+
+# Numeric fields of `current` kept per observation, in column order
+HISTORY_FIELDS = (
+    "temperature_2m",
+    "apparent_temperature",
+    "relative_humidity_2m",
+    "surface_pressure",
+    "precipitation",
+    "cloud_cover",
+    "wind_speed_10m",
+    "wind_direction_10m",
+)
+
+class LocationRing:
+    """
+    Preallocated ring of the last `capacity` observations for one location.
+
+    Values are float32 columns in HISTORY_FIELDS order (NaN when missing) and
+    times are epoch seconds of the observation, so a location always costs
+    capacity * (4 * len(HISTORY_FIELDS) + 8) bytes however long it is tracked.
+    """
+
+    __slots__ = ("times", "values", "count", "head")
+
+    def __init__(self, capacity: int):
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.values = np.full((capacity, len(HISTORY_FIELDS)), np.nan, dtype=np.float32)
+        self.count = 0
+        self.head = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self.times)
+
+    @property
+    def nbytes(self) -> int:
+        return self.times.nbytes + self.values.nbytes
+
+    def last_time(self) -> Optional[int]:
+        return int(self.times[self.head - 1]) if self.count else None
+
+    def append(self, observed_at: int, row: List[float]):
+        self.times[self.head] = observed_at
+        self.values[self.head] = row
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def ordered(self):
+        """(times, values) oldest first, as views when the ring has not wrapped."""
+        if self.count < self.capacity:
+            return self.times[:self.count], self.values[:self.count]
+        order = np.roll(np.arange(self.capacity), -self.head)
+        return self.times[order], self.values[order]
+
+class ObservationHistory:
+    """
+    Observation rings for up to `max_locations` grid cells.
+
+    A new observation is recorded only when its time differs from the last
+    one for the cell, so repeated reads of a cached observation are free.
+    The least recently updated cell is dropped when the limit is reached.
+    """
+
+    def __init__(self, capacity: int = HISTORY_CAPACITY, max_locations: int = HISTORY_MAX_LOCATIONS):
+        self.capacity = capacity
+        self.max_locations = max_locations
+        self._rings: "OrderedDict[Hashable, LocationRing]" = OrderedDict()
+        self.recorded = 0
+
+    def record(self, cell: Hashable, current: Observation):
+        observed_at = _epoch_seconds(current.time)
+        if observed_at is None:
+            return
+        ring = self._rings.get(cell)
+        if ring is None:
+            ring = self._rings[cell] = LocationRing(self.capacity)
+            while len(self._rings) > self.max_locations:
+                self._rings.popitem(last=False)
+        elif ring.last_time() == observed_at:
+            return
+        self._rings.move_to_end(cell)
+        ring.append(observed_at, [_number(getattr(current, field)) for field in HISTORY_FIELDS])
+        self.recorded += 1
+
+    def series(self, cell: Hashable, window_minutes: Optional[float] = None) -> Dict[str, Any]:
+        """Observations for `cell` within the window, with per-field statistics."""
+        empty = {"count": 0, "capacity": self.capacity, "observations": [], "stats": {}}
+        ring = self._rings.get(cell)
+        if ring is None or not ring.count:
+            return empty
+
+        times, values = ring.ordered()
+        if window_minutes is not None:
+            keep = times >= times[-1] - int(window_minutes * 60)
+            times, values = times[keep], values[keep]
+            if not len(times):
+                return empty
+        values = values.astype(np.float64)
+        labels = np.datetime_as_string(times.astype("datetime64[s]"), unit="m")
+        return {
+            "count": len(times),
+            "capacity": self.capacity,
+            "observations": [
+                {"time": str(label), **dict(zip(HISTORY_FIELDS, _json_row(row)))}
+                for label, row in zip(labels, values)
+            ],
+            "stats": trend_statistics(times, values),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "locations": len(self._rings),
+            "max_locations": self.max_locations,
+            "capacity": self.capacity,
+            "recorded": self.recorded,
+            "bytes": sum(ring.nbytes for ring in self._rings.values()),
+        }
+
+def trend_statistics(times: np.ndarray, values: np.ndarray) -> Dict[str, Dict[str, Optional[float]]]:
+    """
+    Latest value, mean, min, max, standard deviation, net change and the
+    least-squares rate per hour for every field, over all rows at once.
+    """
+    present = ~np.isnan(values)
+    counts = present.sum(axis=0)
+    filled = np.where(present, values, 0.0)
+    safe_counts = np.maximum(counts, 1)
+    mean = filled.sum(axis=0) / safe_counts
+    deviation = np.where(present, values - mean, 0.0)
+    std = np.sqrt((deviation ** 2).sum(axis=0) / safe_counts)
+    minimum = np.where(present, values, np.inf).min(axis=0)
+    maximum = np.where(present, values, -np.inf).max(axis=0)
+
+    # Least-squares slope per column, using only each column's present rows
+    hours = (times - times[0]).astype(np.float64)[:, None] / 3600
+    t_mean = np.where(present, hours, 0.0).sum(axis=0) / safe_counts
+    t_dev = np.where(present, hours - t_mean, 0.0)
+    t_var = (t_dev ** 2).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rate = np.where(t_var > 0, (t_dev * deviation).sum(axis=0) / t_var, np.nan)
+
+    first = values[np.argmax(present, axis=0), np.arange(values.shape[1])]
+    last = values[len(values) - 1 - np.argmax(present[::-1], axis=0), np.arange(values.shape[1])]
+    columns = {
+        "latest": last,
+        "mean": np.where(counts > 0, mean, np.nan),
+        "min": np.where(counts > 0, minimum, np.nan),
+        "max": np.where(counts > 0, maximum, np.nan),
+        "std": np.where(counts > 0, std, np.nan),
+        "change": last - first,
+        "rate_per_hour": rate,
+    }
+    return {
+        field: {name: _json_number(column[i]) for name, column in columns.items()}
+        for i, field in enumerate(HISTORY_FIELDS)
+    }
+
+def _epoch_seconds(value: Any) -> Optional[int]:
+    try:
+        return int(np.datetime64(value, "s").astype(np.int64))
+    except (TypeError, ValueError):
+        return None
+
+def _number(value: Any) -> float:
+    return float(value) if isinstance(value, (int, float)) else np.nan
+
+def _json_number(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 3)
+
+def _json_row(row: np.ndarray) -> List[Optional[float]]:
+    return [_json_number(value) for value in row]
+
+observation_history = ObservationHistory()
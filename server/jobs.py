@@ -0,0 +1,124 @@
+"""Background prediction jobs collected through a separate endpoint."""
+import asyncio
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Dict, Optional
+from .config import JOB_TABLE_MAX_ENTRIES, JOB_TTL_SECONDS
+
+# Shared-cache namespace for job states, and how often remote jobs are polled
+SHARED_NAMESPACE = "prediction_jobs"
+SHARED_POLL_SECONDS = 0.25
+
+class JobTable:
+    """
+    Bounded, expiring table of background tasks.
+
+    Jobs are dropped `ttl` seconds after they were submitted. When the table
+    is full the oldest job is evicted, and cancelled if it is still running,
+    so memory stays bounded regardless of how many results go uncollected.
+
+    With `shared` set to a SharedCache, job states are also published there,
+    so a job submitted on one worker process can be collected from another.
+    """
+
+    def __init__(self, max_entries: int = JOB_TABLE_MAX_ENTRIES, ttl: float = JOB_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._jobs: "OrderedDict[str, tuple]" = OrderedDict()
+        self.submitted = 0
+        self.evicted = 0
+        self.expired = 0
+        self.shared = None
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def submit(self, work: Awaitable[Any]) -> str:
+        """Start `work` in the background and return its job id."""
+        self._purge()
+        while len(self._jobs) >= self.max_entries:
+            _, (_, task) = self._jobs.popitem(last=False)
+            task.cancel()
+            self.evicted += 1
+
+        job_id = secrets.token_urlsafe(12)
+        task = asyncio.ensure_future(work)
+        task.add_done_callback(_consume_exception)
+        self._jobs[job_id] = (time.monotonic() + self.ttl, task)
+        self.submitted += 1
+        if self.shared is not None:
+            self.shared.put_nowait(SHARED_NAMESPACE, job_id, {"status": "pending", "prediction": None}, self.ttl)
+            task.add_done_callback(lambda done: self.shared.put_nowait(
+                SHARED_NAMESPACE, job_id, _state(done), self.ttl
+            ))
+        return job_id
+
+    async def result(self, job_id: str, wait: float = 0) -> Optional[Dict[str, Any]]:
+        """
+        Job status, waiting up to `wait` seconds for it to finish.
+
+        Returns None for unknown or expired jobs.
+        """
+        self._purge()
+        entry = self._jobs.get(job_id)
+        if entry is None:
+            if self.shared is not None:
+                return await self._shared_result(job_id, wait)
+            return None
+        _, task = entry
+        if not task.done() and wait > 0:
+            await asyncio.wait({task}, timeout=wait)
+        return {"id": job_id, **_state(task)}
+
+    async def _shared_result(self, job_id: str, wait: float) -> Optional[Dict[str, Any]]:
+        # Job owned by another worker: poll its published state
+        give_up_at = time.monotonic() + wait
+        while True:
+            hit = await self.shared.get(SHARED_NAMESPACE, job_id)
+            if hit is None:
+                return None
+            state = hit[0]
+            if state["status"] != "pending" or time.monotonic() >= give_up_at:
+                return {"id": job_id, **state}
+            await asyncio.sleep(SHARED_POLL_SECONDS)
+
+    def _purge(self):
+        now = time.monotonic()
+        while self._jobs:
+            job_id, (expires_at, task) = next(iter(self._jobs.items()))
+            if expires_at > now:
+                break
+            del self._jobs[job_id]
+            task.cancel()
+            self.expired += 1
+
+    def cancel_all(self):
+        for _, task in self._jobs.values():
+            task.cancel()
+        self._jobs.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "jobs": len(self._jobs),
+            "pending": sum(1 for _, task in self._jobs.values() if not task.done()),
+            "max_entries": self.max_entries,
+            "submitted": self.submitted,
+            "evicted": self.evicted,
+            "expired": self.expired,
+        }
+
+def _state(task: asyncio.Task) -> Dict[str, Any]:
+    if not task.done():
+        return {"status": "pending", "prediction": None}
+    if task.cancelled():
+        return {"status": "error", "prediction": None, "error": "cancelled"}
+    if task.exception() is not None:
+        return {"status": "error", "prediction": None, "error": str(task.exception())}
+    return {"status": "done", "prediction": task.result()}
+
+def _consume_exception(task: asyncio.Task):
+    if not task.cancelled():
+        task.exception()
+
+prediction_jobs = JobTable()
@@ -1,54 +1,423 @@
 """Foundation Model API integration."""
+import asyncio
+import json
 import os
-from openai import AsyncOpenAI
-from .config import get_oauth_token, get_workspace_host, IS_DATABRICKS_APP
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Iterator, List, Optional, Tuple
+from .admission import AdmissionController
+from .batching import MicroBatcher
+from .cache import TTLCache
+from .metrics import metrics, stage, record_upstream
+from .models import DegradedPrediction, Location, Observation
+from .nowcast import nowcaster, local_prediction
+from .resilience import budget
+from .routing import EndpointRouter, LARGE, parse_endpoints, tier_for
+from .config import (
+    credentials,
+    SERVING_ENDPOINTS,
+    LLM_REQUEST_TIMEOUT,
+    LLM_BATCH_ENABLED,
+    LLM_BATCH_WINDOW_MS,
+    LLM_BATCH_MAX_SIZE,
+    PREDICTION_CACHE_ENABLED,
+    PREDICTION_CACHE_TTL_SECONDS,
+    PREDICTION_CACHE_MAX_ENTRIES,
+    PREDICTION_CACHE_MAX_BYTES,
+    PREDICTION_BUCKETS,
+)
 
-def get_llm_client() -> AsyncOpenAI:
+if TYPE_CHECKING:
+    # Imported lazily (see import_openai): openai takes most of a second to import
+    from openai import AsyncOpenAI
+
+# Bump whenever the prompt text changes so cached predictions are not reused
+PROMPT_VERSION = "1"
+SYSTEM_PROMPT = "You are a meteorologist making very short-term weather predictions."
+
+def import_openai():
+    import openai
+    return openai
+
+def _is_endpoint_failure(e: BaseException) -> bool:
+    # Client errors (bad request, auth) are not a sign of an unhealthy endpoint
+    if isinstance(e, import_openai().APIStatusError):
+        return e.status_code >= 500 or e.status_code == 429
+    return True
+
+class LLMClientManager:
+    """
+    Holds one AsyncOpenAI client for the serving endpoints.
+
+    The client is built once; when the cached token rotates a copy is made
+    with `with_options(api_key=...)`, which keeps the underlying HTTP
+    connection pool, and the reference is swapped in a single assignment.
+    """
+
+    def __init__(self):
+        self._client: Optional["AsyncOpenAI"] = None
+        self._version = -1
+
+    async def get_client(self) -> "AsyncOpenAI":
+        with stage("token"):
+            await credentials.get_token_async()
+        token, version = credentials.snapshot()
+        client = self._client
+        if client is not None and version == self._version:
+            return client
+
+        if client is None:
+            client = import_openai().AsyncOpenAI(
+                api_key=token,
+                base_url=f"{credentials.host()}/serving-endpoints"
+            )
+        else:
+            client = client.with_options(api_key=token)
+        self._client, self._version = client, version
+        return client
+
+    async def close(self):
+        client, self._client = self._client, None
+        self._version = -1
+        if client is not None:
+            await client.close()
+
+llm_clients = LLMClientManager()
+
+async def get_llm_client() -> "AsyncOpenAI":
     """Get OpenAI-compatible client for Databricks Foundation Models."""
-    host = get_workspace_host()
-
-    if IS_DATABRICKS_APP:
-        # Remote: Use service principal token
-        token = os.environ.get("DATABRICKS_TOKEN") or get_oauth_token()
-    else:
-        # Local: Use profile token
-        token = get_oauth_token()
-
-    return AsyncOpenAI(
-        api_key=token,
-        base_url=f"{host}/serving-endpoints"
+    return await llm_clients.get_client()
+
+async def close_llm_client():
+    """Close the shared LLM client (called from the app lifespan)."""
+    await llm_clients.close()
+
+# Predictions keyed on bucketed conditions
+prediction_cache = TTLCache(
+    max_entries=PREDICTION_CACHE_MAX_ENTRIES,
+    max_bytes=PREDICTION_CACHE_MAX_BYTES,
+    name="prediction",
+)
+
+def get_serving_endpoint() -> str:
+    return os.environ.get("SERVING_ENDPOINT", "databricks-claude-sonnet-4-5")
+
+# Per-endpoint latency/error tracking, circuit breakers and failover
+endpoint_router = EndpointRouter(
+    parse_endpoints(SERVING_ENDPOINTS) or [(get_serving_endpoint(), LARGE)],
+    is_failure=_is_endpoint_failure,
+)
+
+def _bucket(field: str, value):
+    width = PREDICTION_BUCKETS.get(field, 0)
+    if value is None or not width:
+        return value
+    index = round(float(value) / width)
+    if field == "wind_direction_10m":
+        index %= max(int(round(360 / width)), 1)
+    return index
+
+def prediction_fingerprint(current_conditions: Observation, tier: str) -> Tuple:
+    """
+    Cache key: model tier, endpoint configuration, prompt version and the
+    bucketed condition fields, plus the bucketed forecast when there is one.
+    """
+    key = (tier, endpoint_router.signature, PROMPT_VERSION) + tuple(
+        _bucket(field, getattr(current_conditions, field)) for field in PREDICTION_BUCKETS
     )
+    forecast = current_conditions.forecast_5m
+    if forecast is not None:
+        key += ("forecast",) + tuple(_bucket(field, getattr(forecast, field)) for field in PREDICTION_BUCKETS)
+    return key
 
-async def predict_weather(current_conditions: dict) -> str:
-    """Use Foundation Model to predict weather 5 minutes from now."""
-    client = get_llm_client()
-    model = os.environ.get("SERVING_ENDPOINT", "databricks-claude-sonnet-4-5")
+def _conditions_block(current_conditions: Observation) -> str:
+    block = f"""- Temperature: {current_conditions.temperature_2m}°F
+- Feels Like: {current_conditions.apparent_temperature}°F
+- Humidity: {current_conditions.relative_humidity_2m}%
+- Wind Speed: {current_conditions.wind_speed_10m} mph
+- Wind Direction: {current_conditions.wind_direction_10m}°
+- Cloud Cover: {current_conditions.cloud_cover}%
+- Precipitation: {current_conditions.precipitation} mm
+- Weather Code: {current_conditions.weather_code}"""
+    forecast = current_conditions.forecast_5m
+    if forecast is not None:
+        # Forecast mode: the model's own 5-minute outlook, interpolated from its 15-minute series
+        block += f"""
+Forecast model outlook for 5 minutes from now:
+- Temperature: {forecast.temperature_2m}°F
+- Feels Like: {forecast.apparent_temperature}°F
+- Wind Speed: {forecast.wind_speed_10m} mph
+- Cloud Cover: {forecast.cloud_cover}%
+- Precipitation: {forecast.precipitation} mm
+- Weather Code: {forecast.weather_code}"""
+    return block
 
-    # Build prompt with current conditions
-    prompt = f"""You are a weather prediction AI. Based on the current weather conditions below, predict what the weather will be like in 5 minutes from now.
+def build_prompt(current_conditions: Observation) -> str:
+    """Build prompt with current conditions."""
+    return f"""You are a weather prediction AI. Based on the current weather conditions below, predict what the weather will be like in 5 minutes from now.
 
 Current Conditions:
-- Temperature: {current_conditions.get('temperature_2m')}°F
-- Feels Like: {current_conditions.get('apparent_temperature')}°F
-- Humidity: {current_conditions.get('relative_humidity_2m')}%
-- Wind Speed: {current_conditions.get('wind_speed_10m')} mph
-- Wind Direction: {current_conditions.get('wind_direction_10m')}°
-- Cloud Cover: {current_conditions.get('cloud_cover')}%
-- Precipitation: {current_conditions.get('precipitation')} mm
-- Weather Code: {current_conditions.get('weather_code')}
+{_conditions_block(current_conditions)}
 
 Provide a brief, conversational prediction (2-3 sentences) about what the weather will be like in exactly 5 minutes. Be realistic - in 5 minutes, weather typically doesn't change dramatically unless there's an active weather event. Include any relevant advice or observations."""
 
+def build_batch_prompt(conditions: List[Observation]) -> str:
+    """One prompt asking for a JSON array with a prediction per location."""
+    locations = "\n\n".join(
+        f"Location {i}:\n{_conditions_block(current)}" for i, current in enumerate(conditions, 1)
+    )
+    return f"""You are a weather prediction AI. For each location below, predict what the weather will be like in 5 minutes from now based on its current conditions.
+
+{locations}
+
+For each location, write a brief, conversational prediction (2-3 sentences) about what the weather will be like in exactly 5 minutes. Be realistic - in 5 minutes, weather typically doesn't change dramatically unless there's an active weather event. Include any relevant advice or observations.
+
+Return a JSON array of exactly {len(conditions)} strings, one prediction per location in the order given, and nothing else."""
+
+def parse_batch_response(text: str, expected: int) -> List[str]:
+    """Predictions from a batched answer; ValueError unless it is a JSON array of `expected` strings."""
+    text = (text or "").strip()
+    if text.startswith("```"):
+        # Tolerate a fenced code block around the array
+        text = text.strip("`").removeprefix("json").strip()
+    predictions = json.loads(text)  # JSONDecodeError is a ValueError
+    if (
+        not isinstance(predictions, list)
+        or len(predictions) != expected
+        or not all(isinstance(p, str) and p.strip() for p in predictions)
+    ):
+        raise ValueError(f"expected a JSON array of {expected} non-empty strings")
+    return predictions
+
+def _completion_args(current_conditions: Observation, model: str) -> dict:
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": build_prompt(current_conditions)}
+        ],
+        "max_tokens": 500,
+        "temperature": 0.7,
+    }
+
+@contextmanager
+def _serving_call() -> Iterator[None]:
+    # Record status and latency of one serving-endpoint request
+    start = time.perf_counter()
+    status = 200
     try:
-        response = await client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a meteorologist making very short-term weather predictions."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500,
-            temperature=0.7,
+        yield
+    except asyncio.TimeoutError:
+        status = "timeout"
+        raise
+    except Exception as e:
+        if isinstance(e, import_openai().APITimeoutError):
+            status = "timeout"
+        else:
+            status = getattr(e, "status_code", None) or "error"
+        raise
+    finally:
+        record_upstream("serving_endpoint", status, time.perf_counter() - start)
+
+async def generate_prediction(current_conditions: Observation, model: str, timeout: Optional[float] = None) -> str:
+    """
+    Call one serving endpoint; raises on failure.
+
+    The call gets whatever is left of the request deadline (at most
+    LLM_REQUEST_TIMEOUT) unless `timeout` is given.
+    """
+    client = await get_llm_client()
+    if timeout is None:
+        timeout = budget(1.0, LLM_REQUEST_TIMEOUT)
+    with stage("llm"), _serving_call():
+        response = await asyncio.wait_for(
+            client.chat.completions.create(**_completion_args(current_conditions, model)),
+            timeout,
         )
+    return response.choices[0].message.content
+
+def _expiry(timeout: Optional[float]) -> Callable[[], Optional[float]]:
+    # What is left of an explicit timeout for each failover attempt
+    if timeout is None:
+        return lambda: None
+    expires_at = time.monotonic() + timeout
+    return lambda: expires_at - time.monotonic()
+
+async def routed_prediction(current_conditions: Observation, tier: str, timeout: Optional[float] = None) -> str:
+    """generate_prediction on the best endpoint for `tier`, failing over on endpoint errors."""
+    left = _expiry(timeout)
+    return await endpoint_router.call(
+        tier, lambda model: generate_prediction(current_conditions, model, left())
+    )
+
+async def generate_batch_predictions(batch: List[Tuple[Observation, str]], timeout: float) -> List[str]:
+    """One serving-endpoint call for several (conditions, tier) items sharing a tier."""
+    tier = batch[0][1]
+    left = _expiry(timeout)
+
+    async def call(model: str) -> str:
+        client = await get_llm_client()
+        with stage("llm"), _serving_call():
+            response = await asyncio.wait_for(
+                client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": build_batch_prompt([current for current, _ in batch])},
+                    ],
+                    max_tokens=200 + 250 * len(batch),
+                    temperature=0.7,
+                ),
+                left(),
+            )
         return response.choices[0].message.content
+
+    # Parsed outside the router: a malformed answer is not an endpoint failure
+    return parse_batch_response(await endpoint_router.call(tier, call), len(batch))
+
+def _admitted(call: Callable[[Any, float], Awaitable[Any]]) -> Callable[[Any, float], Awaitable[Any]]:
+    """`call` holding one admission slot; time spent queued for it comes off the timeout."""
+    async def admitted(arg, timeout: float):
+        start = time.monotonic()
+        async with llm_admission.slot():
+            return await call(arg, timeout - (time.monotonic() - start))
+    return admitted
+
+# Prediction requests for the same tier arriving within LLM_BATCH_WINDOW_MS share one
+# call, and each upstream call (merged, single or fallback) takes one admission slot
+prediction_batcher = MicroBatcher(
+    call_batch=_admitted(generate_batch_predictions),
+    call_single=_admitted(lambda item, timeout: routed_prediction(item[0], item[1], timeout)),
+    window=LLM_BATCH_WINDOW_MS / 1000,
+    max_size=LLM_BATCH_MAX_SIZE,
+    timeout_cap=LLM_REQUEST_TIMEOUT,
+)
+
+def _is_overload(e: BaseException) -> bool:
+    # Signals that the endpoint wants less concurrency
+    openai = import_openai()
+    if isinstance(e, openai.APIStatusError):
+        return e.status_code == 429
+    return isinstance(e, (openai.APITimeoutError, asyncio.TimeoutError))
+
+# Adaptive concurrency limit and fair queue in front of the serving endpoint
+llm_admission = AdmissionController("serving_endpoint", is_overload=_is_overload)
+
+async def request_prediction(current_conditions: Observation, tier: str) -> str:
+    """
+    Generate a prediction once admitted (raises Overloaded when shed),
+    micro-batched with concurrent requests when enabled. Batched predictions
+    share the admission slot of their upstream call.
+    """
+    if LLM_BATCH_ENABLED:
+        return await prediction_batcher.submit(tier, (current_conditions, tier))
+    async with llm_admission.slot():
+        return await routed_prediction(current_conditions, tier)
+
+def degraded_prediction(current_conditions: Observation, tier: str, error: Exception) -> DegradedPrediction:
+    """Stale cached prediction if there is one, otherwise the local nowcast."""
+    metrics.inc("degraded_predictions_total", {"reason": type(error).__name__})
+    if PREDICTION_CACHE_ENABLED:
+        stale = prediction_cache.peek(prediction_fingerprint(current_conditions, tier))
+        if stale is not None:
+            return DegradedPrediction(stale)
+    return DegradedPrediction(local_prediction(current_conditions, {}))
+
+async def predict_weather(current_conditions: Observation, location: Optional[Location] = None) -> str:
+    """
+    Use Foundation Model to predict weather 5 minutes from now.
+
+    Stable conditions are answered by the local nowcaster without an LLM call;
+    pass `location` so it can use the recent trend for that grid cell. Other
+    calm conditions go to a fast-tier endpoint and active weather to a large
+    one. When every endpoint fails or times out, a degraded prediction is
+    returned.
+    """
+    with stage("nowcast"):
+        local = nowcaster.nowcast(current_conditions, location)
+    if local is not None:
+        return local
+
+    tier = tier_for(current_conditions)
+    try:
+        if not PREDICTION_CACHE_ENABLED:
+            return await request_prediction(current_conditions, tier)
+        return await prediction_cache.get_or_fetch(
+            prediction_fingerprint(current_conditions, tier),
+            lambda: request_prediction(current_conditions, tier),
+            PREDICTION_CACHE_TTL_SECONDS,
+        )
     except Exception as e:
-        return f"Error generating prediction: {str(e)}"
+        return degraded_prediction(current_conditions, tier, e)
+
+async def stream_prediction(current_conditions: Observation, location: Optional[Location] = None) -> AsyncIterator[str]:
+    """
+    Yield prediction text as the serving endpoint generates it.
+
+    Local nowcasts, cached and degraded predictions are yielded as a single
+    chunk. A stream that runs to completion is stored in the prediction
+    cache; one that is abandoned (the consumer closes or cancels the
+    generator) closes the upstream response so the endpoint stops generating.
+    """
+    with stage("nowcast"):
+        local = nowcaster.nowcast(current_conditions, location)
+    if local is not None:
+        yield local
+        return
+
+    tier = tier_for(current_conditions)
+    key = prediction_fingerprint(current_conditions, tier)
+    if PREDICTION_CACHE_ENABLED:
+        cached = prediction_cache.lookup(key)
+        if cached is not None:
+            yield cached
+            return
+
+    # The admission slot is held for the whole stream
+    ticket = None
+    try:
+        if llm_admission.enabled:
+            ticket = await llm_admission.acquire()
+        client = await get_llm_client()
+
+        async def open_stream(model: str):
+            with stage("llm_first_byte"), _serving_call():
+                return await asyncio.wait_for(
+                    client.chat.completions.create(
+                        **_completion_args(current_conditions, model),
+                        stream=True,
+                    ),
+                    budget(1.0, LLM_REQUEST_TIMEOUT),
+                )
+
+        # Fails over only until the stream opens
+        stream = await endpoint_router.call(tier, open_stream)
+    except BaseException as e:
+        if ticket is not None:
+            ticket.release(e)
+        if not isinstance(e, Exception):
+            # Cancelled while opening (the client left); the slot is released above
+            raise
+        yield degraded_prediction(current_conditions, tier, e)
+        return
+
+    parts = []
+    first_byte = None
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first_byte is None and ticket is not None:
+                    first_byte = time.monotonic() - ticket.started
+                parts.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+    except BaseException as e:
+        if ticket is not None:
+            ticket.release(e, first_byte)
+        raise
+    finally:
+        await stream.close()
+        if ticket is not None:
+            ticket.release(latency=first_byte)
+
+    if PREDICTION_CACHE_ENABLED and parts:
+        prediction_cache.set(key, "".join(parts), PREDICTION_CACHE_TTL_SECONDS)
@@ -0,0 +1,198 @@
+"""Lightweight request-stage timing and Prometheus-style metrics."""
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Histogram buckets in seconds, spanning cache hits to slow LLM generations
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Stage timings for the current request, set by TimingMiddleware
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+def _labels(labels: Optional[Dict[str, str]]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items())) if labels else ()
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (
+        f'{key}="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Metrics:
+    """
+    Counters, gauges and histograms rendered in the Prometheus text format.
+
+    Collectors are callables run at scrape time that yield
+    (name, labels, value) samples, typed by `describe` (gauge by default), so
+    existing stats dicts (caches, sessions) are exported without extra work
+    on the request path.
+    """
+
+    def __init__(self):
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]] = []
+
+    def describe(self, name: str, kind: str, help_text: str):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name: str, labels: Optional[Dict[str, str]] = None, value: float = 1):
+        series = self._counters.setdefault(name, {})
+        key = _labels(labels)
+        series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        self._gauges.setdefault(name, {})[_labels(labels)] = value
+
+    def add(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        series = self._gauges.setdefault(name, {})
+        key = _labels(labels)
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        series = self._histograms.setdefault(name, {})
+        key = _labels(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        histogram.observe(value)
+
+    def collector(self, fn: Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]):
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        def header(name: str, default_kind: str):
+            kind, help_text = self._help.get(name, (default_kind, ""))
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name, series in self._counters.items():
+            header(name, "counter")
+            for labels, value in series.items():
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+        gauges: Dict[str, Dict[Labels, float]] = {name: dict(series) for name, series in self._gauges.items()}
+        for collect in self._collectors:
+            for name, labels, value in collect():
+                gauges.setdefault(name, {})[_labels(labels)] = value
+        for name, series in gauges.items():
+            header(name, "gauge")
+            for labels, value in series.items():
+                lines.append(f"{name}{_format_labels(labels)} {float(value):g}")
+
+        for name, series in self._histograms.items():
+            header(name, "histogram")
+            for labels, histogram in series.items():
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', f'{bound:g}'))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+metrics.describe("stage_duration_seconds", "histogram", "Time spent in each request stage")
+metrics.describe("upstream_requests_total", "counter", "Upstream calls by upstream and status")
+metrics.describe("upstream_duration_seconds", "histogram", "Upstream call latency")
+metrics.describe("http_requests_total", "counter", "HTTP requests by route and status")
+metrics.describe("http_request_duration_seconds", "histogram", "Time to response start by route")
+metrics.describe("http_requests_in_flight", "gauge", "Requests currently being handled")
+metrics.describe("errors_total", "counter", "Request failures by exception type")
+metrics.describe("degraded_predictions_total", "counter", "Predictions served stale or local after an LLM failure")
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block as a request stage (Server-Timing entry and histogram)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe("stage_duration_seconds", elapsed, {"stage": name})
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+def record_upstream(upstream: str, status, elapsed: float):
+    metrics.inc("upstream_requests_total", {"upstream": upstream, "status": status})
+    metrics.observe("upstream_duration_seconds", elapsed, {"upstream": upstream})
+
+def server_timing(timings: List[Tuple[str, float]], total: float) -> str:
+    entries = [f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in timings]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+class TimingMiddleware:
+    """
+    ASGI middleware that collects stage timings for each HTTP request.
+
+    Adds a `Server-Timing` header listing the stages that completed before
+    the response started, and records per-route request counts, latency and
+    the in-flight gauge.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: List[Tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                elapsed = time.perf_counter() - start
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(timings, elapsed).encode()))
+                message = {**message, "headers": headers}
+                metrics.observe("http_request_duration_seconds", elapsed, {"route": _route(scope)})
+            await send(message)
+
+        metrics.add("http_requests_in_flight", 1)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            metrics.add("http_requests_in_flight", -1)
+            metrics.inc("http_requests_total", {"route": _route(scope), "status": status["code"]})
+            _request_timings.reset(token)
+
+def _route(scope) -> str:
+    # Route templates keep label cardinality bounded
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
@@ -0,0 +1,257 @@
+"""Typed weather payloads, the WMO code table and the JSON codec for responses."""
+import json
+from typing import Any, Dict, Optional
+from starlette.responses import JSONResponse
+
+try:
+    # In requirements.txt: the stdlib fallback is slower than plain dicts through JSONResponse
+    import orjson
+except ImportError:
+    orjson = None
+
+WMO_DESCRIPTIONS: Dict[int, str] = {
+    0: "Clear sky",
+    1: "Mainly clear",
+    2: "Partly cloudy",
+    3: "Overcast",
+    45: "Foggy",
+    48: "Depositing rime fog",
+    51: "Light drizzle",
+    53: "Moderate drizzle",
+    55: "Dense drizzle",
+    61: "Slight rain",
+    63: "Moderate rain",
+    65: "Heavy rain",
+    71: "Slight snow",
+    73: "Moderate snow",
+    75: "Heavy snow",
+    77: "Snow grains",
+    80: "Slight rain showers",
+    81: "Moderate rain showers",
+    82: "Violent rain showers",
+    85: "Slight snow showers",
+    86: "Heavy snow showers",
+    95: "Thunderstorm",
+    96: "Thunderstorm with slight hail",
+    99: "Thunderstorm with heavy hail",
+}
+
+def describe(weather_code: Optional[int]) -> str:
+    """WMO weather code to description."""
+    return WMO_DESCRIPTIONS.get(weather_code, "Unknown")
+
+# Numeric fields of an observation, as Open-Meteo names them
+OBSERVATION_FIELDS = (
+    "temperature_2m",
+    "relative_humidity_2m",
+    "apparent_temperature",
+    "precipitation",
+    "weather_code",
+    "cloud_cover",
+    "wind_speed_10m",
+    "wind_direction_10m",
+    "surface_pressure",
+)
+
+class Location:
+    """Coordinates of a request and the timezone Open-Meteo resolved for them."""
+
+    __slots__ = ("latitude", "longitude", "timezone", "utc_offset_seconds")
+
+    def __init__(self, latitude: float, longitude: float, timezone: str = "Unknown", utc_offset_seconds: int = 0):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.timezone = timezone
+        self.utc_offset_seconds = utc_offset_seconds
+
+    def at(self, latitude: float, longitude: float) -> "Location":
+        """The same timezone at other coordinates (a request inside a cached grid cell)."""
+        return Location(latitude, longitude, self.timezone, self.utc_offset_seconds)
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "Location":
+        return cls(data["latitude"], data["longitude"], data.get("timezone", "Unknown"), data.get("utc_offset_seconds", 0))
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "timezone": self.timezone,
+            "utc_offset_seconds": self.utc_offset_seconds,
+        }
+
+class Observation:
+    """
+    One set of conditions (Open-Meteo's `current` block) and its WMO description.
+
+    Instances are not modified after parsing, so the cached one is shared by
+    every request for the cell. In forecast mode `forecast_5m` holds the
+    conditions five minutes later.
+    """
+
+    __slots__ = ("time", "interval") + OBSERVATION_FIELDS + ("description", "forecast_5m")
+
+    def __init__(
+        self,
+        time: str = "",
+        interval: Optional[int] = None,
+        temperature_2m: Optional[float] = None,
+        relative_humidity_2m: Optional[float] = None,
+        apparent_temperature: Optional[float] = None,
+        precipitation: Optional[float] = None,
+        weather_code: Optional[int] = None,
+        cloud_cover: Optional[float] = None,
+        wind_speed_10m: Optional[float] = None,
+        wind_direction_10m: Optional[float] = None,
+        surface_pressure: Optional[float] = None,
+        forecast_5m: Optional["Observation"] = None,
+    ):
+        self.time = time
+        self.interval = interval
+        self.temperature_2m = temperature_2m
+        self.relative_humidity_2m = relative_humidity_2m
+        self.apparent_temperature = apparent_temperature
+        self.precipitation = precipitation
+        self.weather_code = weather_code
+        self.cloud_cover = cloud_cover
+        self.wind_speed_10m = wind_speed_10m
+        self.wind_direction_10m = wind_direction_10m
+        self.surface_pressure = surface_pressure
+        self.description = describe(weather_code)
+        self.forecast_5m = forecast_5m
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "Observation":
+        """From Open-Meteo's `current` block, or `to_json` output."""
+        forecast = data.get("forecast_5m")
+        get = data.get
+        return cls(
+            get("time", ""),
+            get("interval"),
+            get("temperature_2m"),
+            get("relative_humidity_2m"),
+            get("apparent_temperature"),
+            get("precipitation"),
+            get("weather_code"),
+            get("cloud_cover"),
+            get("wind_speed_10m"),
+            get("wind_direction_10m"),
+            get("surface_pressure"),
+            cls.from_json(forecast) if forecast else None,
+        )
+
+    def to_json(self) -> Dict[str, Any]:
+        data = {
+            "time": self.time,
+            "interval": self.interval,
+            "temperature_2m": self.temperature_2m,
+            "relative_humidity_2m": self.relative_humidity_2m,
+            "apparent_temperature": self.apparent_temperature,
+            "precipitation": self.precipitation,
+            "weather_code": self.weather_code,
+            "cloud_cover": self.cloud_cover,
+            "wind_speed_10m": self.wind_speed_10m,
+            "wind_direction_10m": self.wind_direction_10m,
+            "surface_pressure": self.surface_pressure,
+            "description": self.description,
+        }
+        if self.forecast_5m is not None:
+            data["forecast_5m"] = self.forecast_5m.to_json()
+        return data
+
+class Conditions:
+    """Current weather at a location: what `get_current_weather` returns and the weather cache holds."""
+
+    __slots__ = ("location", "current", "timestamp", "stale")
+
+    def __init__(self, location: Location, current: Observation, timestamp: Optional[str] = None, stale: bool = False):
+        self.location = location
+        self.current = current
+        self.timestamp = current.time if timestamp is None else timestamp
+        self.stale = stale
+
+    @classmethod
+    def from_upstream(cls, latitude: float, longitude: float, item: Dict[str, Any]) -> "Conditions":
+        """One location object of an Open-Meteo `current` answer."""
+        location = Location(latitude, longitude, item.get("timezone", "Unknown"), item.get("utc_offset_seconds", 0))
+        return cls(location, Observation.from_json(item.get("current") or {}))
+
+    def at(self, latitude: float, longitude: float) -> "Conditions":
+        """The cell's conditions reported at the requested coordinates; the observation is shared."""
+        return Conditions(self.location.at(latitude, longitude), self.current, self.timestamp, self.stale)
+
+    def as_stale(self) -> "Conditions":
+        return Conditions(self.location, self.current, self.timestamp, True)
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "Conditions":
+        if isinstance(data, cls):
+            return data
+        return cls(
+            Location.from_json(data["location"]),
+            Observation.from_json(data["current"]),
+            data.get("timestamp"),
+            data.get("stale", False),
+        )
+
+    def to_json(self) -> Dict[str, Any]:
+        data = {"location": self.location, "current": self.current, "timestamp": self.timestamp}
+        if self.stale:
+            data["stale"] = True
+        return data
+
+class DegradedPrediction(str):
+    """A prediction served in place of the LLM's answer: a stale cached one or a local nowcast."""
+
+    __slots__ = ()
+
+class WeatherResponse:
+    """Current conditions with their prediction: one `/api/weather` body, batch item or pushed update."""
+
+    __slots__ = ("location", "current", "timestamp", "stale", "prediction", "prediction_id", "degraded")
+
+    def __init__(self, conditions: Conditions, prediction: Optional[str], prediction_id: Optional[str] = None):
+        self.location = conditions.location
+        self.current = conditions.current
+        self.timestamp = conditions.timestamp
+        self.stale = conditions.stale
+        self.prediction = prediction
+        self.prediction_id = prediction_id
+        self.degraded = isinstance(prediction, DegradedPrediction)
+
+    def to_json(self) -> Dict[str, Any]:
+        data = {
+            "current": self.current,
+            "prediction": self.prediction,
+            "location": self.location,
+            "timestamp": self.timestamp,
+        }
+        if self.prediction_id is not None:
+            data["prediction_id"] = self.prediction_id
+        if self.stale:
+            data["stale"] = True
+        if self.degraded:
+            data["degraded"] = True
+        return data
+
+def json_default(value: Any) -> Any:
+    """`default` hook for json/orjson: a model's JSON form."""
+    to_json = getattr(value, "to_json", None)
+    if to_json is None:
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return to_json()
+
+def dumps(value: Any) -> bytes:
+    """Compact JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(value, default=json_default)
+    return json.dumps(value, default=json_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+def loads(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with `dumps`, so models serialize without FastAPI's generic encoder."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,162 @@
+"""Local rule-based nowcaster used instead of the LLM for stable conditions."""
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from .config import (
+    NOWCAST_MODE,
+    NOWCAST_MAX_WIND_MPH,
+    NOWCAST_MAX_TEMP_RATE,
+    NOWCAST_MAX_CLOUD_RATE,
+    NOWCAST_TRACKED_LOCATIONS,
+)
+from .forecast import FORECAST_HORIZON_MINUTES
+from .models import Location, Observation
+from .weather import quantize
+
+# WMO codes that describe settled skies (clear through overcast)
+CALM_WEATHER_CODES = {0, 1, 2, 3}
+
+# Fields whose per-minute rate of change is tracked between observations
+TREND_FIELDS = ("temperature_2m", "apparent_temperature", "cloud_cover", "wind_speed_10m")
+
+COMPASS_POINTS = ("north", "northeast", "east", "southeast", "south", "southwest", "west", "northwest")
+
+class Nowcaster:
+    """
+    Routes each prediction either to a local template or to the LLM.
+
+    In `auto` mode the local path is taken for calm WMO codes with light wind,
+    no precipitation and slow temperature and cloud trends. Trends come from
+    the forecast deltas in forecast mode, otherwise from the last two
+    distinct observations seen for the location's grid cell.
+    """
+
+    def __init__(self, mode: str = NOWCAST_MODE, max_tracked: int = NOWCAST_TRACKED_LOCATIONS):
+        self.mode = mode
+        self.max_tracked = max_tracked
+        self._observations: "OrderedDict[Tuple[float, float], Tuple[Optional[Observation], Observation]]" = OrderedDict()
+        self.local = 0
+        self.llm = 0
+        self.reasons: Counter = Counter()
+
+    def observe(self, location: Optional[Location], current: Observation) -> Dict[str, float]:
+        """
+        Record the observation and return per-minute rates of change: toward
+        `forecast_5m` when the conditions carry one (forecast mode), otherwise
+        since the previous observation.
+        """
+        forecast = current.forecast_5m
+        if forecast is not None:
+            return _rates(current, forecast, FORECAST_HORIZON_MINUTES)
+        if location is None:
+            return {}
+        cell = quantize(location.latitude, location.longitude)
+        previous, latest = self._observations.get(cell, (None, None))
+        if latest is None or latest.time != current.time:
+            # Observations are never modified, so the instance itself is kept
+            previous, latest = latest, current
+            self._observations[cell] = (previous, latest)
+        self._observations.move_to_end(cell)
+        while len(self._observations) > self.max_tracked:
+            self._observations.popitem(last=False)
+        if previous is None:
+            return {}
+
+        return _rates(previous, latest, _minutes_between(previous, latest))
+
+    def route(self, current: Observation, trend: Dict[str, float]) -> Tuple[bool, str]:
+        """Return (use_llm, reason)."""
+        if self.mode == "llm":
+            return True, "mode"
+        if self.mode == "local":
+            return False, "mode"
+        if current.weather_code not in CALM_WEATHER_CODES:
+            return True, "active_weather"
+        if (current.precipitation or 0) > 0:
+            return True, "precipitation"
+        forecast = current.forecast_5m
+        if forecast is not None and (forecast.weather_code not in CALM_WEATHER_CODES or (forecast.precipitation or 0) > 0):
+            return True, "forecast_change"
+        if (current.wind_speed_10m or 0) > NOWCAST_MAX_WIND_MPH:
+            return True, "wind"
+        if abs(trend.get("temperature_2m", 0)) > NOWCAST_MAX_TEMP_RATE:
+            return True, "temperature_trend"
+        if abs(trend.get("cloud_cover", 0)) > NOWCAST_MAX_CLOUD_RATE:
+            return True, "cloud_trend"
+        return False, "stable"
+
+    def nowcast(self, current: Observation, location: Optional[Location] = None) -> Optional[str]:
+        """Local prediction text, or None when the LLM should be used."""
+        trend = self.observe(location, current)
+        use_llm, reason = self.route(current, trend)
+        self.reasons[reason] += 1
+        if use_llm:
+            self.llm += 1
+            return None
+        self.local += 1
+        return local_prediction(current, trend)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.local + self.llm
+        return {
+            "mode": self.mode,
+            "local": self.local,
+            "llm": self.llm,
+            "local_ratio": round(self.local / total, 3) if total else 0.0,
+            "reasons": dict(self.reasons),
+            "tracked_locations": len(self._observations),
+        }
+
+def _rates(start: Observation, end: Observation, minutes: float) -> Dict[str, float]:
+    rates = {}
+    for field in TREND_FIELDS:
+        before, after = getattr(start, field), getattr(end, field)
+        if before is not None and after is not None:
+            rates[field] = (after - before) / minutes
+    return rates
+
+def _minutes_between(previous: Observation, latest: Observation) -> float:
+    try:
+        delta = datetime.fromisoformat(latest.time) - datetime.fromisoformat(previous.time)
+        minutes = delta.total_seconds() / 60
+    except (TypeError, ValueError):
+        minutes = 0
+    if minutes <= 0:
+        minutes = float(latest.interval or 900) / 60
+    return minutes
+
+def _wind_phrase(speed: float, direction: Optional[float]) -> str:
+    compass = COMPASS_POINTS[int(((direction or 0) % 360 + 22.5) // 45) % 8]
+    if speed < 3:
+        return "calm air"
+    if speed < 8:
+        return f"a light breeze from the {compass}"
+    return f"a steady {speed:.0f} mph wind from the {compass}"
+
+def local_prediction(current: Observation, trend: Dict[str, float], minutes: int = 5) -> str:
+    """Template prediction: persistence plus linear extrapolation of the trends."""
+    description = current.description
+    temperature = (current.temperature_2m or 0) + trend.get("temperature_2m", 0) * minutes
+    feels_like = (current.apparent_temperature or 0) + trend.get("apparent_temperature", 0) * minutes
+    change = trend.get("temperature_2m", 0) * minutes
+
+    tendency = ""
+    if change >= 0.5:
+        tendency = ", slowly warming"
+    elif change <= -0.5:
+        tendency = ", slowly cooling"
+
+    text = (
+        f"{description} right now, and that should hold for the next {minutes} minutes. "
+        f"Expect around {temperature:.0f}°F (feels like {feels_like:.0f}°F){tendency}, "
+        f"with {_wind_phrase(current.wind_speed_10m or 0, current.wind_direction_10m)}."
+    )
+    if feels_like <= 32:
+        text += " Bundle up - it feels below freezing."
+    elif feels_like >= 90:
+        text += " Stay hydrated in the heat."
+    elif (current.relative_humidity_2m or 0) >= 85:
+        text += " It will feel damp out there."
+    return text
+
+nowcaster = Nowcaster()
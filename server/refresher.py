@@ -0,0 +1,232 @@
+"""Background refresh of the most requested grid cells (stale-while-revalidate)."""
+import asyncio
+import heapq
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from .admission import BACKGROUND, request_priority
+from .config import (
+    REFRESHER_ENABLED,
+    REFRESHER_TOP_K,
+    REFRESHER_HALF_LIFE_SECONDS,
+    REFRESHER_MIN_SCORE,
+    REFRESHER_INTERVAL_SECONDS,
+    REFRESHER_MAX_UPSTREAM_RPS,
+    REFRESHER_PREDICTIONS,
+    REFRESHER_TRACKED_LOCATIONS,
+    REQUEST_DEADLINE_SECONDS,
+    WEATHER_CACHE_ENABLED,
+    PREDICTION_CACHE_TTL_SECONDS,
+)
+from .llm import predict_weather
+from .metrics import metrics
+from .models import Conditions
+from .resilience import deadline
+from .weather import get_current_weather, quantize, weather_cache
+
+logger = logging.getLogger(__name__)
+
+Cell = Tuple[float, float]
+
+class PopularityTracker:
+    """
+    Request counts per cell that decay exponentially with `half_life`, so a
+    cell's score is roughly its recent request rate times the half-life.
+    The least recently requested cell is dropped beyond `max_cells`.
+    """
+
+    def __init__(self, half_life: float = REFRESHER_HALF_LIFE_SECONDS, max_cells: int = REFRESHER_TRACKED_LOCATIONS):
+        self.decay = math.log(2) / half_life
+        self.max_cells = max_cells
+        self._cells: "OrderedDict[Hashable, Tuple[float, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def record(self, cell: Hashable, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        self._cells[cell] = (self.score(cell, now) + 1, now)
+        self._cells.move_to_end(cell)
+        while len(self._cells) > self.max_cells:
+            self._cells.popitem(last=False)
+
+    def score(self, cell: Hashable, now: Optional[float] = None) -> float:
+        entry = self._cells.get(cell)
+        if entry is None:
+            return 0.0
+        score, updated = entry
+        now = time.monotonic() if now is None else now
+        return score * math.exp(-self.decay * (now - updated))
+
+    def top(self, k: int, now: Optional[float] = None) -> List[Tuple[Hashable, float]]:
+        """The `k` highest-scoring cells with their scores, best first."""
+        now = time.monotonic() if now is None else now
+        return heapq.nlargest(
+            k,
+            ((cell, score * math.exp(-self.decay * (now - updated))) for cell, (score, updated) in self._cells.items()),
+            key=lambda item: item[1],
+        )
+
+class TokenBucket:
+    """`rate` tokens per second, accumulating up to `burst`."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < tokens:
+            return False
+        self.tokens -= tokens
+        return True
+
+class Refresher:
+    """
+    Keeps the weather and prediction of the most requested cells fresh.
+
+    Every `interval` seconds the top `top_k` cells by decayed request count
+    (with at least `min_score`) become the hot set. A hot cell whose cached
+    observation has expired, i.e. Open-Meteo has a new one, is refetched in
+    the background and its prediction regenerated, and so is one whose
+    prediction has outlived the prediction cache TTL.
+
+    Requests for a hot cell whose entry has expired get that entry at once,
+    marked stale, while the refresh runs (stale-while-revalidate), instead
+    of waiting on Open-Meteo and the LLM.
+
+    Refreshes draw on a token bucket of `max_upstream_rps`. A refresh is
+    charged as one Open-Meteo request plus one serving-endpoint request when
+    predictions are refreshed. Without budget, cells wait for the next tick
+    and requests fetch for themselves as usual.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = REFRESHER_ENABLED and WEATHER_CACHE_ENABLED,
+        top_k: int = REFRESHER_TOP_K,
+        min_score: float = REFRESHER_MIN_SCORE,
+        interval: float = REFRESHER_INTERVAL_SECONDS,
+        max_upstream_rps: float = REFRESHER_MAX_UPSTREAM_RPS,
+        predictions: bool = REFRESHER_PREDICTIONS,
+    ):
+        self.enabled = enabled
+        self.top_k = top_k
+        self.min_score = min_score
+        self.interval = interval
+        self.predictions = predictions
+        self.cost = 2.0 if predictions else 1.0
+        self.tracker = PopularityTracker()
+        self.budget = TokenBucket(max_upstream_rps, max(max_upstream_rps * interval, self.cost))
+        self.hot: Dict[Cell, float] = {}
+        self._predicted: Dict[Cell, float] = {}
+        self._inflight: Dict[Cell, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.stale_served = 0
+        self.over_budget = 0
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in self._inflight.values():
+            task.cancel()
+
+    async def current_weather(self, latitude: float, longitude: float) -> Conditions:
+        """`get_current_weather`, counting the request and serving hot cells stale while they refresh."""
+        if not self.enabled:
+            return await get_current_weather(latitude, longitude)
+        cell = quantize(latitude, longitude)
+        self.tracker.record(cell)
+        if cell in self.hot and weather_cache.get(cell) is None:
+            expired = weather_cache.peek(cell)
+            if expired is not None and self.revalidate(cell):
+                self.stale_served += 1
+                metrics.inc("refresher_stale_served_total")
+                return expired.as_stale().at(latitude, longitude)
+        return await get_current_weather(latitude, longitude)
+
+    def revalidate(self, cell: Cell) -> bool:
+        """Refresh `cell` in the background unless it already is; False when over budget."""
+        if cell in self._inflight:
+            return True
+        if not self.budget.try_acquire(self.cost):
+            self.over_budget += 1
+            return False
+        task = asyncio.ensure_future(self._refresh(cell))
+        self._inflight[cell] = task
+        task.add_done_callback(lambda _: self._inflight.pop(cell, None))
+        return True
+
+    async def _refresh(self, cell: Cell):
+        start = time.monotonic()
+        try:
+            with deadline(REQUEST_DEADLINE_SECONDS), request_priority(BACKGROUND):
+                weather = await get_current_weather(*cell)
+                if self.predictions:
+                    await predict_weather(weather.current, weather.location)
+                    self._predicted[cell] = time.monotonic()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.refresh_errors += 1
+            metrics.inc("refresher_refreshes_total", {"outcome": "error"})
+            logger.warning("Refreshing hot cell %s failed: %s", cell, str(e) or type(e).__name__)
+        else:
+            self.refreshes += 1
+            metrics.inc("refresher_refreshes_total", {"outcome": "ok"})
+            metrics.observe("refresher_refresh_duration_seconds", time.monotonic() - start)
+
+    def _due(self, cell: Cell, now: float) -> bool:
+        if weather_cache.get(cell) is None:
+            return True
+        predicted = self._predicted.get(cell)
+        return self.predictions and (predicted is None or now - predicted >= PREDICTION_CACHE_TTL_SECONDS)
+
+    def tick(self):
+        now = time.monotonic()
+        self.hot = {cell: score for cell, score in self.tracker.top(self.top_k, now) if score >= self.min_score}
+        for cell in [cell for cell in self._predicted if cell not in self.hot]:
+            del self._predicted[cell]
+        for cell in self.hot:
+            if cell not in self._inflight and self._due(cell, now) and not self.revalidate(cell):
+                # Out of budget until the bucket refills
+                break
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Refresher tick failed")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "tracked_cells": len(self.tracker),
+            "hot_cells": [
+                {"latitude": cell[0], "longitude": cell[1], "score": round(score, 2)}
+                for cell, score in sorted(self.hot.items(), key=lambda item: -item[1])
+            ],
+            "in_flight": len(self._inflight),
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "stale_served": self.stale_served,
+            "over_budget": self.over_budget,
+            "budget_tokens": round(self.budget.tokens, 2),
+        }
+
+refresher = Refresher()
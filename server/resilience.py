@@ -0,0 +1,219 @@
+"""Request deadlines, hedged requests and circuit breakers for upstream calls."""
+import asyncio
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+
+# Absolute (monotonic) deadline of the current request, if any
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The request's end-to-end deadline has passed."""
+
+class CircuitOpenError(Exception):
+    """The upstream's circuit breaker is open; the call was not attempted."""
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """Give the enclosed work an end-to-end deadline (never extends an outer one)."""
+    new = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(new if outer is None else min(outer, new))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None without one."""
+    current = _deadline.get()
+    return None if current is None else current - time.monotonic()
+
+def budget(share: float, cap: float) -> float:
+    """
+    Timeout for one upstream call: `share` of the remaining deadline, at most
+    `cap`. Without a deadline the cap is used as-is.
+    """
+    left = remaining()
+    if left is None:
+        return cap
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(left * share, cap)
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `failure_threshold` consecutive failures the breaker opens and calls
+    fail fast with CircuitOpenError. After `reset_timeout` seconds one trial
+    call is let through (half-open); its outcome closes or re-opens the breaker.
+    `is_failure` decides which exceptions count (e.g. not 4xx client errors).
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_timeout: float,
+        is_failure: Callable[[BaseException], bool] = lambda e: True,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self.rejections = 0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = False
+        if self.state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    async def call(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.allow():
+            self.rejections += 1
+            raise CircuitOpenError(f"{self.name} circuit breaker is open")
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            self._trial_in_flight = False
+            raise
+        except BaseException as e:
+            if self.is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips,
+            "rejections": self.rejections,
+        }
+
+class Hedger:
+    """
+    Sends a second, identical request when the first is slower than the
+    `percentile` of recent latencies, and returns whichever succeeds first.
+
+    Hedging only starts once `min_samples` latencies have been observed, and
+    never waits less than `min_delay` seconds before sending the hedge.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        percentile: float,
+        min_delay: float,
+        window: int = 200,
+        min_samples: int = 20,
+        enabled: bool = True,
+    ):
+        self.name = name
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.enabled = enabled
+        self._latencies: deque = deque(maxlen=window)
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def delay(self) -> Optional[float]:
+        if not self.enabled or len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(ordered[index], self.min_delay)
+
+    async def run(self, fn: Callable[[], Awaitable[Any]], timeout: float) -> Any:
+        """Run `fn` (possibly twice) within `timeout` seconds."""
+        self.requests += 1
+        start = time.monotonic()
+
+        async def attempt():
+            attempt_start = time.monotonic()
+            result = await fn()
+            self._latencies.append(time.monotonic() - attempt_start)
+            return result
+
+        first = asyncio.ensure_future(attempt())
+        tasks = {first}
+        try:
+            hedge_delay = self.delay()
+            wait = timeout if hedge_delay is None else min(hedge_delay, timeout)
+            await asyncio.wait(tasks, timeout=wait)
+            if first.done():
+                return first.result()
+            if hedge_delay is None or hedge_delay >= timeout:
+                raise asyncio.TimeoutError(f"{self.name} request timed out after {timeout:.2f}s")
+
+            self.hedges += 1
+            second = asyncio.ensure_future(attempt())
+            tasks.add(second)
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                left = timeout - (time.monotonic() - start)
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(left, 0), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            if error is not None and pending == set():
+                raise error
+            raise asyncio.TimeoutError(f"{self.name} request timed out after {timeout:.2f}s")
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": round(self.hedges / self.requests, 3) if self.requests else 0.0,
+            "hedge_delay_ms": round(self.delay() * 1000, 1) if self.delay() is not None else None,
+        }
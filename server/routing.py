@@ -0,0 +1,184 @@
+"""Latency-aware routing of predictions across several serving endpoints."""
+import logging
+import math
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from .config import (
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_SECONDS,
+    ROUTER_EWMA_ALPHA,
+    ROUTER_ERROR_PENALTY,
+    ROUTER_EXPLORE_RATIO,
+)
+from .metrics import metrics
+from .models import Observation
+from .resilience import CircuitBreaker, CircuitOpenError, remaining
+
+logger = logging.getLogger(__name__)
+
+# Model tiers: a small fast model for calm conditions, a larger one for active weather
+FAST, LARGE = "fast", "large"
+TIERS = (FAST, LARGE)
+
+# WMO codes from drizzle upwards (precipitation, snow, showers, thunderstorms)
+ACTIVE_WEATHER_CODE = 51
+
+def parse_endpoints(value: str) -> List[Tuple[str, str]]:
+    """"name=tier,name=tier" -> [(name, tier), ...]; the tier defaults to large."""
+    endpoints = []
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        name, _, tier = entry.partition("=")
+        tier = tier.strip().lower() or LARGE
+        if tier not in TIERS:
+            raise ValueError(f"Unknown tier {tier!r} for serving endpoint {name!r}")
+        endpoints.append((name.strip(), tier))
+    return endpoints
+
+def tier_for(current_conditions: Observation) -> str:
+    """Large model for active weather codes, fast model otherwise."""
+    code = current_conditions.weather_code or 0
+    return LARGE if code >= ACTIVE_WEATHER_CODE else FAST
+
+class Endpoint:
+    """One serving endpoint with its latency and error-rate averages."""
+
+    __slots__ = ("name", "tier", "breaker", "latency", "error_rate", "in_flight", "requests", "failures", "failovers")
+
+    def __init__(self, name: str, tier: str, breaker: CircuitBreaker):
+        self.name = name
+        self.tier = tier
+        self.breaker = breaker
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.failovers = 0
+
+    def score(self, error_penalty: float) -> float:
+        """
+        Expected cost: latency, weighted by error rate and by the calls
+        already in flight. An unmeasured endpoint scores 0 while idle so it
+        gets tried, but is not piled onto before its first answer, and goes
+        last once it has failed.
+        """
+        if self.latency is None:
+            return 0.0 if not (self.in_flight or self.error_rate) else math.inf
+        return self.latency * (1 + error_penalty * self.error_rate) * (1 + self.in_flight)
+
+class EndpointRouter:
+    """
+    Sends each call to the best endpoint for its tier and fails over on error.
+
+    Candidates are the endpoints of the requested tier, best score first
+    (EWMA latency weighted by EWMA error rate and calls in flight), then the
+    other tiers' in the same order; endpoints whose circuit breaker is open
+    go last. A share `explore_ratio` of calls shuffles the tier's endpoints
+    so slow-scored ones get re-measured. Each endpoint has its own breaker, and a call that
+    fails with an endpoint failure (`is_failure`) or an open breaker moves
+    on to the next candidate while the request deadline allows.
+    """
+
+    def __init__(
+        self,
+        endpoints: List[Tuple[str, str]],
+        is_failure: Callable[[BaseException], bool] = lambda e: True,
+        alpha: float = ROUTER_EWMA_ALPHA,
+        error_penalty: float = ROUTER_ERROR_PENALTY,
+        explore_ratio: float = ROUTER_EXPLORE_RATIO,
+    ):
+        if not endpoints:
+            raise ValueError("At least one serving endpoint is required")
+        self.is_failure = is_failure
+        self.alpha = alpha
+        self.error_penalty = error_penalty
+        self.explore_ratio = explore_ratio
+        self.endpoints = [
+            Endpoint(name, tier, CircuitBreaker(
+                f"serving_endpoint:{name}",
+                failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                reset_timeout=BREAKER_RESET_SECONDS,
+                is_failure=is_failure,
+            ))
+            for name, tier in endpoints
+        ]
+
+    @property
+    def signature(self) -> str:
+        """Changes whenever the endpoint configuration does (for ETags)."""
+        return ",".join(f"{endpoint.name}={endpoint.tier}" for endpoint in self.endpoints)
+
+    def candidates(self, tier: str) -> List[Endpoint]:
+        def rank(endpoint: Endpoint):
+            return (endpoint.breaker.state == CircuitBreaker.OPEN, endpoint.tier != tier, endpoint.score(self.error_penalty))
+
+        ordered = sorted(self.endpoints, key=rank)
+        if random.random() < self.explore_ratio:
+            same = [endpoint for endpoint in ordered if endpoint.tier == tier]
+            random.shuffle(same)
+            ordered = same + [endpoint for endpoint in ordered if endpoint.tier != tier]
+        return ordered
+
+    async def call(self, tier: str, fn: Callable[[str], Awaitable[Any]]) -> Any:
+        """`fn(endpoint_name)` on the best endpoint for `tier`, failing over on endpoint errors."""
+        candidates = self.candidates(tier)
+        for i, endpoint in enumerate(candidates):
+            start = time.monotonic()
+            endpoint.in_flight += 1
+            try:
+                result = await endpoint.breaker.call(lambda: fn(endpoint.name))
+            except CircuitOpenError as e:
+                error = e
+            except Exception as e:
+                if not self.is_failure(e):
+                    self._record(endpoint, tier, None, "client_error")
+                    raise
+                self._record(endpoint, tier, None, "error")
+                error = e
+            else:
+                self._record(endpoint, tier, time.monotonic() - start, "ok")
+                return result
+            finally:
+                endpoint.in_flight -= 1
+
+            left = remaining()
+            if i + 1 == len(candidates) or (left is not None and left <= 0):
+                raise error
+            endpoint.failovers += 1
+            metrics.inc("llm_failovers_total", {"endpoint": endpoint.name})
+            logger.warning("Serving endpoint %s failed (%s); failing over to %s", endpoint.name, error, candidates[i + 1].name)
+
+    def _record(self, endpoint: Endpoint, tier: str, latency: Optional[float], outcome: str):
+        endpoint.requests += 1
+        metrics.inc("llm_routed_total", {"endpoint": endpoint.name, "tier": tier, "outcome": outcome})
+        failed = outcome == "error"
+        endpoint.error_rate += self.alpha * (failed - endpoint.error_rate)
+        if failed:
+            endpoint.failures += 1
+        if latency is not None:
+            metrics.observe("llm_endpoint_duration_seconds", latency, {"endpoint": endpoint.name})
+            endpoint.latency = latency if endpoint.latency is None else endpoint.latency + self.alpha * (latency - endpoint.latency)
+
+    def breakers(self) -> List[CircuitBreaker]:
+        return [endpoint.breaker for endpoint in self.endpoints]
+
+    def stats(self) -> Dict[str, Any]:
+        def score(endpoint: Endpoint) -> Optional[float]:
+            value = endpoint.score(self.error_penalty)
+            return None if math.isinf(value) else round(value, 4)
+
+        return {
+            endpoint.name: {
+                "tier": endpoint.tier,
+                "requests": endpoint.requests,
+                "failures": endpoint.failures,
+                "failovers": endpoint.failovers,
+                "latency_ewma_ms": round(endpoint.latency * 1000, 1) if endpoint.latency is not None else None,
+                "error_rate_ewma": round(endpoint.error_rate, 3),
+                "in_flight": endpoint.in_flight,
+                "score": score(endpoint),
+                "breaker": endpoint.breaker.stats(),
+            }
+            for endpoint in self.endpoints
+        }
@@ -0,0 +1,234 @@
+"""Cross-process cache tier in a local SQLite file, for running several workers."""
+import asyncio
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple, Union
+from .config import (
+    SHARED_CACHE_PATH,
+    SHARED_CACHE_LEASE_SECONDS,
+    SHARED_CACHE_POLL_MS,
+)
+from .models import json_default
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    cache TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (cache, key)
+);
+CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at);
+CREATE TABLE IF NOT EXISTS leases (
+    cache TEXT NOT NULL,
+    key TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (cache, key)
+);
+"""
+
+# Expired rows are deleted after this many writes
+_PRUNE_EVERY = 256
+
+class SharedCache:
+    """
+    Cache entries shared by every worker process on the host.
+
+    Backed by one SQLite file in WAL mode, so readers in one process never
+    block writers in another. All database work runs in worker threads.
+
+    `get_or_fetch` gives cross-process single-flight: on a miss a process
+    takes a lease row for the key before fetching; others poll for the value
+    instead of fetching too, until the lease expires (the holder died or is
+    stuck) after `lease_seconds`. Expiry is wall-clock time.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        lease_seconds: float = SHARED_CACHE_LEASE_SECONDS,
+        poll_interval: float = SHARED_CACHE_POLL_MS / 1000,
+    ):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.owner = f"{os.getpid()}-{secrets.token_hex(4)}"
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._writes = 0
+        self._background: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.lease_timeouts = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    async def open(self):
+        await asyncio.to_thread(self._connect)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        self._conn = conn
+
+    async def close(self):
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await asyncio.to_thread(conn.close)
+
+    # Database operations, run in a worker thread
+
+    def _get(self, name: str, key: str) -> Optional[Tuple[Any, float]]:
+        now = time.time()
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries WHERE cache = ? AND key = ? AND expires_at > ?",
+                (name, key, now),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1] - now
+
+    def _put(self, name: str, key: str, value: Any, ttl: float):
+        now = time.time()
+        encoded = json.dumps(value, default=json_default)
+        with self._db_lock:
+            if self._conn is None:
+                # Late background write after shutdown
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", (name, key, encoded, now + ttl)
+            )
+            self._writes += 1
+            if self._writes % _PRUNE_EVERY == 0:
+                self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+                self._conn.execute("DELETE FROM leases WHERE expires_at <= ?", (now,))
+
+    def _try_lease(self, name: str, key: str) -> bool:
+        now = time.time()
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "DELETE FROM leases WHERE cache = ? AND key = ? AND expires_at <= ?", (name, key, now)
+                )
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO leases VALUES (?, ?, ?, ?)",
+                    (name, key, self.owner, now + self.lease_seconds),
+                )
+                owner = self._conn.execute(
+                    "SELECT owner FROM leases WHERE cache = ? AND key = ?", (name, key)
+                ).fetchone()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return owner is not None and owner[0] == self.owner
+
+    def _release(self, name: str, key: str):
+        with self._db_lock:
+            self._conn.execute(
+                "DELETE FROM leases WHERE cache = ? AND key = ? AND owner = ?", (name, key, self.owner)
+            )
+
+    # Async API
+
+    async def get(self, name: str, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """(value, remaining ttl) or None."""
+        try:
+            return await asyncio.to_thread(self._get, name, json.dumps(key))
+        except sqlite3.Error:
+            self.errors += 1
+            logger.exception("Shared cache read failed")
+            return None
+
+    async def put(self, name: str, key: Hashable, value: Any, ttl: float):
+        try:
+            await asyncio.to_thread(self._put, name, json.dumps(key), value, ttl)
+        except sqlite3.Error:
+            self.errors += 1
+            logger.exception("Shared cache write failed")
+
+    def put_nowait(self, name: str, key: Hashable, value: Any, ttl: float):
+        """Write in the background (for entries stored without a fetch)."""
+        task = asyncio.ensure_future(self.put(name, key, value, ttl))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def get_or_fetch(
+        self,
+        name: str,
+        key: Hashable,
+        fetch: Callable[[], Awaitable[Any]],
+        ttl: Union[float, Callable[[Any], float]],
+    ) -> Tuple[Any, float]:
+        """(value, ttl) from the shared tier, fetching once across processes on a miss."""
+        encoded = json.dumps(key)
+        give_up_at = time.monotonic() + self.lease_seconds
+        leased = False
+        waited = False
+        while True:
+            try:
+                hit = await asyncio.to_thread(self._get, name, encoded)
+                if hit is not None:
+                    self.hits += 1
+                    return hit
+                leased = await asyncio.to_thread(self._try_lease, name, encoded)
+            except sqlite3.Error:
+                # The shared tier is an optimization; fall back to fetching
+                self.errors += 1
+                logger.exception("Shared cache lookup failed")
+                break
+            if leased:
+                break
+            if time.monotonic() >= give_up_at:
+                self.lease_timeouts += 1
+                break
+            if not waited:
+                waited = True
+                self.waits += 1
+            await asyncio.sleep(self.poll_interval)
+
+        self.misses += 1
+        try:
+            value = await fetch()
+            seconds = ttl(value) if callable(ttl) else ttl
+            if seconds > 0:
+                await self.put(name, key, value, seconds)
+            return value, seconds
+        finally:
+            if leased:
+                try:
+                    await asyncio.to_thread(self._release, name, encoded)
+                except sqlite3.Error:
+                    self.errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "path": self.path or None,
+            "pid": os.getpid(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "waits": self.waits,
+            "lease_timeouts": self.lease_timeouts,
+            "errors": self.errors,
+        }
+
+shared_cache = SharedCache(SHARED_CACHE_PATH)
@@ -0,0 +1,194 @@
+"""In-memory, precompressed serving of the built frontend."""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+from typing import Any, Dict, Optional, Tuple
+from starlette.datastructures import Headers
+from starlette.responses import Response
+
+try:
+    # In requirements.txt; without it only gzip variants are built
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Vite emits bundles to assets/ named like index-CO8jQzNZ.js (an 8-character
+# base64url content hash); their content never changes
+HASHED_NAME = re.compile(r"^assets/.+-[A-Za-z0-9_-]{8}\.[a-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/xml")
+# Smaller files are not worth a Content-Encoding
+MIN_COMPRESS_BYTES = 256
+
+class StaticAsset:
+    """One file's bytes, its precompressed variants and response headers."""
+
+    __slots__ = ("body", "encoded", "etag", "headers")
+
+    def __init__(self, path: str, body: bytes, content_type: str, mtime: float):
+        self.body = body
+        self.encoded: Dict[str, bytes] = {}
+        self.etag = hashlib.sha1(body).hexdigest()[:20]
+        self.headers = {
+            "Content-Type": content_type,
+            "Cache-Control": IMMUTABLE if HASHED_NAME.search(path) else REVALIDATE,
+            "Last-Modified": formatdate(mtime, usegmt=True),
+            "Vary": "Accept-Encoding",
+        }
+        if len(body) >= MIN_COMPRESS_BYTES and content_type.startswith(COMPRESSIBLE):
+            compressed = gzip.compress(body, 9, mtime=0)
+            if len(compressed) < len(body):
+                self.encoded["gzip"] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.encoded["br"] = compressed
+
+    def variant(self, accept_encoding: str) -> Tuple[Optional[str], bytes]:
+        """(content encoding, body) for the best encoding the client accepts."""
+        accepted = parse_accept_encoding(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in self.encoded and accepted.get(encoding, accepted.get("*", 0)) > 0:
+                return encoding, self.encoded[encoding]
+        return None, self.body
+
+    def response(self, request_headers, head: bool = False) -> Response:
+        encoding, body = self.variant(request_headers.get("accept-encoding", ""))
+        etag = f'"{self.etag}-{encoding}"' if encoding else f'"{self.etag}"'
+        headers = {**self.headers, "ETag": etag}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and self.matches(if_none_match):
+            headers.pop("Content-Type")
+            headers.pop("Content-Encoding", None)
+            return Response(status_code=304, headers=headers)
+        if head:
+            headers["Content-Length"] = str(len(body))
+            return Response(status_code=200, headers=headers)
+        return Response(body, headers=headers)
+
+    def matches(self, if_none_match: str) -> bool:
+        # Any encoding's tag names the same content
+        for tag in if_none_match.split(","):
+            tag = tag.strip().removeprefix("W/").strip('"')
+            if tag == "*" or tag.split("-")[0] == self.etag:
+                return True
+        return False
+
+def parse_accept_encoding(value: str) -> Dict[str, float]:
+    """{"gzip": 1.0, "br": 0.5, ...} from an Accept-Encoding header."""
+    accepted = {}
+    for part in value.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, number = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+class StaticAssets:
+    """
+    The frontend build directory, loaded into memory once at startup.
+
+    Every file is kept with gzip and brotli variants precomputed (brotli
+    only if the package imports), so requests are answered without disk I/O:
+    the best encoding is picked from Accept-Encoding, content-hashed bundles
+    are sent with immutable cache headers, everything else (index.html) with
+    `no-cache` so browsers revalidate, and a matching If-None-Match gets 304.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.assets: Dict[str, StaticAsset] = {}
+        self.hits = 0
+        self.not_modified = 0
+        self.encodings: Dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return os.path.isdir(self.directory)
+
+    def load(self):
+        assets = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                if content_type.startswith("text/") or content_type == "application/javascript":
+                    content_type += "; charset=utf-8"
+                with open(path, "rb") as f:
+                    body = f.read()
+                assets[relative] = StaticAsset(relative, body, content_type, os.path.getmtime(path))
+        self.assets = assets
+        logger.info(
+            "Loaded %d static files (%d bytes, brotli %s)",
+            len(assets), sum(len(asset.body) for asset in assets.values()),
+            "on" if brotli is not None else "off",
+        )
+
+    def get(self, path: str) -> Optional[StaticAsset]:
+        return self.assets.get(path.lstrip("/"))
+
+    def response(self, path: str, request_headers, head: bool = False) -> Optional[Response]:
+        asset = self.get(path)
+        if asset is None:
+            return None
+        response = asset.response(request_headers, head)
+        self.hits += 1
+        if response.status_code == 304:
+            self.not_modified += 1
+        encoding = response.headers.get("content-encoding", "identity")
+        self.encodings[encoding] = self.encodings.get(encoding, 0) + 1
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "files": len(self.assets),
+            "bytes": sum(len(asset.body) for asset in self.assets.values()),
+            "compressed_bytes": {
+                encoding: sum(len(asset.encoded[encoding]) for asset in self.assets.values() if encoding in asset.encoded)
+                for encoding in ("gzip", "br")
+            },
+            "brotli": brotli is not None,
+            "hits": self.hits,
+            "not_modified": self.not_modified,
+            "encodings": dict(self.encodings),
+        }
+
+class StaticFilesApp:
+    """ASGI app serving `StaticAssets` under a mount prefix (e.g. /assets)."""
+
+    def __init__(self, assets: StaticAssets, prefix: str):
+        self.assets = assets
+        self.prefix = prefix.strip("/")
+
+    async def __call__(self, scope, receive, send):
+        if scope["method"] not in ("GET", "HEAD"):
+            response = Response(status_code=405, headers={"Allow": "GET, HEAD"})
+        else:
+            path, root_path = scope["path"], scope.get("root_path", "")
+            if path.startswith(root_path):
+                # Starlette keeps the full path and adds the mount point to root_path
+                path = path[len(root_path):]
+            path = f"{self.prefix}/{path.lstrip('/')}"
+            response = self.assets.response(path, Headers(scope=scope), scope["method"] == "HEAD")
+            if response is None:
+                response = Response("Not Found", status_code=404, media_type="text/plain")
+        await response(scope, receive, send)
@@ -0,0 +1,151 @@
+"""Optional on-disk copy of the weather and prediction caches for warm restarts."""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from .cache import TTLCache
+from .config import STORE_FLUSH_SECONDS, STORE_MAX_BATCH, STORE_PATH
+from .models import json_default
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    cache TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (cache, key)
+);
+CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at);
+"""
+
+class PersistentStore:
+    """
+    SQLite mirror of TTLCache entries.
+
+    `attach` preloads a cache with its unexpired rows and then records every
+    new entry. Records only go into an in-memory batch (a later write for the
+    same key replaces an earlier one); a background task hands the batch to a
+    worker thread every `flush_interval` seconds, or sooner once it holds
+    `max_batch` entries, so the event loop never waits on disk. Expiry is
+    stored as wall-clock time so it survives the restart.
+    """
+
+    def __init__(self, path: str, flush_interval: float = STORE_FLUSH_SECONDS, max_batch: int = STORE_MAX_BATCH):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._pending: Dict[Tuple[str, Hashable], Tuple[Any, float]] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self.restored = 0
+        self.written = 0
+        self.flushes = 0
+        self.write_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    async def open(self):
+        await asyncio.to_thread(self._connect)
+        self._wake = asyncio.Event()
+        self._flush_task = asyncio.ensure_future(self._flush_loop())
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+        conn.commit()
+        self._conn = conn
+
+    async def attach(self, cache: TTLCache):
+        """Preload `cache` from disk, then mirror its writes."""
+        rows = await asyncio.to_thread(self._read, cache.name)
+        now = time.time()
+        for key, value, expires_at in rows:
+            value = json.loads(value)
+            cache.set(_decode_key(key), cache.decode(value) if cache.decode else value, expires_at - now)
+            self.restored += 1
+        cache.on_set = lambda key, value, ttl: self.record(cache.name, key, value, ttl)
+        logger.info("Restored %d %s cache entries from %s", len(rows), cache.name, self.path)
+
+    def _read(self, name: str) -> List[Tuple[str, str, float]]:
+        with self._db_lock:
+            return self._conn.execute(
+                "SELECT key, value, expires_at FROM entries WHERE cache = ? AND expires_at > ?"
+                " ORDER BY expires_at",
+                (name, time.time()),
+            ).fetchall()
+
+    def record(self, name: str, key: Hashable, value: Any, ttl: float):
+        self._pending[(name, key)] = (value, time.time() + ttl)
+        if len(self._pending) >= self.max_batch and self._wake is not None:
+            self._wake.set()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        if not self._pending or self._conn is None:
+            return
+        batch, self._pending = self._pending, {}
+        try:
+            await asyncio.to_thread(self._write, batch)
+        except Exception:
+            self.write_errors += 1
+            logger.exception("Writing %d entries to %s failed", len(batch), self.path)
+
+    def _write(self, batch: Dict[Tuple[str, Hashable], Tuple[Any, float]]):
+        # Serialize in the worker thread too; cached values are not mutated in place
+        rows = [
+            (name, json.dumps(key), json.dumps(value, default=json_default), expires_at)
+            for (name, key), (value, expires_at) in batch.items()
+        ]
+        with self._db_lock:
+            self._conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", rows)
+            self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+        self.written += len(rows)
+        self.flushes += 1
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await asyncio.to_thread(conn.close)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "path": self.path or None,
+            "restored": self.restored,
+            "pending": len(self._pending),
+            "written": self.written,
+            "flushes": self.flushes,
+            "write_errors": self.write_errors,
+        }
+
+def _decode_key(key: str) -> Hashable:
+    # Cache keys are tuples, which JSON turns into lists
+    value = json.loads(key)
+    return tuple(value) if isinstance(value, list) else value
+
+persistent_store = PersistentStore(STORE_PATH)
@@ -0,0 +1,162 @@
+"""Push subscriptions: one refresh loop per grid cell, fanned out to subscribers."""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+from .config import (
+    SUBSCRIPTION_MAX_CONNECTIONS,
+    SUBSCRIPTION_MIN_REFRESH_SECONDS,
+    SUBSCRIPTION_RETRY_SECONDS,
+)
+from .models import WeatherResponse
+from .weather import observation_ttl, quantize
+
+logger = logging.getLogger(__name__)
+
+Cell = Tuple[float, float]
+
+class SubscriptionLimitError(Exception):
+    """The process already holds SUBSCRIPTION_MAX_CONNECTIONS subscribers."""
+
+class Subscriber:
+    """
+    One connected client.
+
+    Holds only the latest undelivered update: a slow consumer that has not
+    collected the previous update has it replaced (conflated), so a stalled
+    connection costs one payload reference rather than a growing queue.
+    """
+
+    __slots__ = ("cell", "pending", "event", "conflated")
+
+    def __init__(self, cell: Cell):
+        self.cell = cell
+        self.pending: Optional[WeatherResponse] = None
+        self.event = asyncio.Event()
+        self.conflated = 0
+
+    def offer(self, payload: WeatherResponse):
+        if self.pending is not None:
+            self.conflated += 1
+        self.pending = payload
+        self.event.set()
+
+    async def next(self, timeout: float) -> Optional[WeatherResponse]:
+        """Wait for the next update; None after `timeout` seconds (heartbeat)."""
+        if self.pending is None:
+            try:
+                await asyncio.wait_for(self.event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        payload, self.pending = self.pending, None
+        self.event.clear()
+        return payload
+
+class _Channel:
+    __slots__ = ("subscribers", "task", "last_payload", "last_key")
+
+    def __init__(self):
+        self.subscribers: Set[Subscriber] = set()
+        self.task: Optional[asyncio.Task] = None
+        self.last_payload: Optional[WeatherResponse] = None
+        self.last_key: Optional[Tuple] = None
+
+class SubscriptionHub:
+    """
+    Keeps one refresh loop per active grid cell and pushes changes to every
+    subscriber of that cell.
+
+    `loader(latitude, longitude)` returns the payload for a cell. The loop
+    reloads when the cell's next observation is due, and publishes only when
+    the observation time or prediction text changed. A cell's loop stops when
+    its last subscriber leaves.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[float, float], Awaitable[WeatherResponse]],
+        max_connections: int = SUBSCRIPTION_MAX_CONNECTIONS,
+    ):
+        self.loader = loader
+        self.max_connections = max_connections
+        self._channels: Dict[Cell, _Channel] = {}
+        self.subscribers = 0
+        self.publishes = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self._conflated_closed = 0
+
+    @property
+    def full(self) -> bool:
+        return self.subscribers >= self.max_connections
+
+    def subscribe(self, latitude: float, longitude: float) -> Subscriber:
+        if self.full:
+            raise SubscriptionLimitError("Too many subscriptions")
+        cell = quantize(latitude, longitude)
+        channel = self._channels.get(cell)
+        if channel is None:
+            channel = self._channels[cell] = _Channel()
+        subscriber = Subscriber(cell)
+        channel.subscribers.add(subscriber)
+        self.subscribers += 1
+        if channel.last_payload is not None:
+            subscriber.offer(channel.last_payload)
+        if channel.task is None or channel.task.done():
+            channel.task = asyncio.ensure_future(self._refresh_loop(cell, channel))
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        channel = self._channels.get(subscriber.cell)
+        if channel is None or subscriber not in channel.subscribers:
+            return
+        channel.subscribers.discard(subscriber)
+        self.subscribers -= 1
+        self._conflated_closed += subscriber.conflated
+        if not channel.subscribers:
+            if channel.task is not None:
+                channel.task.cancel()
+            del self._channels[subscriber.cell]
+
+    async def _refresh_loop(self, cell: Cell, channel: _Channel):
+        while channel.subscribers:
+            self.refreshes += 1
+            try:
+                payload = await self.loader(*cell)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.refresh_errors += 1
+                logger.exception("Refreshing subscription cell %s failed", cell)
+                await asyncio.sleep(SUBSCRIPTION_RETRY_SECONDS)
+                continue
+
+            key = (payload.current.time, payload.prediction)
+            if key != channel.last_key:
+                channel.last_key = key
+                channel.last_payload = payload
+                self.publishes += 1
+                for subscriber in channel.subscribers:
+                    subscriber.offer(payload)
+            await asyncio.sleep(max(observation_ttl(payload), SUBSCRIPTION_MIN_REFRESH_SECONDS))
+
+    def close(self):
+        for channel in self._channels.values():
+            if channel.task is not None:
+                channel.task.cancel()
+        self._channels.clear()
+        self.subscribers = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cells": len(self._channels),
+            "subscribers": self.subscribers,
+            "max_connections": self.max_connections,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "publishes": self.publishes,
+            "conflated": self._conflated_closed + sum(
+                subscriber.conflated
+                for channel in self._channels.values()
+                for subscriber in channel.subscribers
+            ),
+        }
@@ -0,0 +1,134 @@
+"""Startup warm-up: SDK imports, credentials, upstream connections and hot caches."""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from .admission import BACKGROUND, request_priority
+from .config import credentials, WARMUP_MODE, WARMUP_LOCATIONS, WARMUP_PREDICTIONS, WARMUP_TIMEOUT_SECONDS
+from .llm import get_llm_client, import_openai, predict_weather
+from .models import Conditions
+from .resilience import deadline, remaining
+from .weather import WEATHER_API_URL, get_current_weather_batch, get_session
+
+logger = logging.getLogger(__name__)
+
+def import_upstream_sdks():
+    """Import the upstream SDKs (run in a thread, off the event loop)."""
+    import_openai()
+    if credentials.needs_sdk():
+        import databricks.sdk  # noqa: F401
+
+def parse_locations(value: str) -> List[Tuple[float, float]]:
+    """"lat,lon;lat,lon" -> [(lat, lon), ...]."""
+    locations = []
+    for pair in filter(None, (part.strip() for part in value.split(";"))):
+        lat, lon = pair.split(",")
+        locations.append((float(lat), float(lon)))
+    return locations
+
+class Warmup:
+    """
+    Runs the warm-up steps once and records their outcome for `/`.
+
+    `mode` is "off" (only import the SDKs in a background thread),
+    "blocking" (the lifespan waits for every step, so the server starts
+    listening warm) or "background" (steps run while the app already serves,
+    and `/` reports "warming" until they finish). A failed step is logged and
+    recorded but never stops the app from starting.
+    """
+
+    def __init__(
+        self,
+        mode: str = WARMUP_MODE,
+        locations: Optional[List[Tuple[float, float]]] = None,
+        predictions: bool = WARMUP_PREDICTIONS,
+        timeout: float = WARMUP_TIMEOUT_SECONDS,
+    ):
+        self.mode = mode
+        self.locations = parse_locations(WARMUP_LOCATIONS) if locations is None else locations
+        self.predictions = predictions
+        self.timeout = timeout
+        self.state = "cold"
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self.duration: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state in ("ready", "off")
+
+    async def start(self):
+        """Called from the lifespan startup."""
+        if self.mode == "blocking":
+            await self.run()
+        elif self.mode == "background":
+            self._task = asyncio.ensure_future(self.run())
+        else:
+            self.state = "off"
+            self._task = asyncio.ensure_future(asyncio.to_thread(import_upstream_sdks))
+
+    async def run(self):
+        self.state = "warming"
+        start = time.perf_counter()
+        with deadline(self.timeout), request_priority(BACKGROUND):
+            await self._step("imports", lambda: asyncio.to_thread(import_upstream_sdks))
+            await self._step("credentials", self._credentials)
+            await asyncio.gather(
+                self._step("serving_endpoint", self._serving_endpoint),
+                self._step("open_meteo", self._open_meteo),
+            )
+        self.duration = time.perf_counter() - start
+        self.state = "ready"
+        logger.info("Warm-up finished in %.2fs: %s", self.duration, self.steps)
+
+    async def _step(self, name: str, fn: Callable[[], Awaitable[Any]]):
+        start = time.perf_counter()
+        try:
+            # The deadline only sizes upstream timeouts; also bound steps like the imports
+            detail = await asyncio.wait_for(fn(), max(remaining(), 0))
+            self.steps[name] = {"ok": True, **(detail or {})}
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            logger.warning("Warm-up step %s failed: %s", name, error)
+            self.steps[name] = {"ok": False, "error": error}
+        self.steps[name]["ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    async def _credentials(self):
+        await asyncio.to_thread(credentials.host)
+        await credentials.get_token_async()
+
+    async def _serving_endpoint(self):
+        # Any answer, even 404, leaves a TLS connection in the client's pool
+        client = await get_llm_client()
+        try:
+            await client.with_options(max_retries=0, timeout=5).models.list()
+        except import_openai().APIStatusError as e:
+            return {"status": e.status_code}
+        return {"status": 200}
+
+    async def _open_meteo(self):
+        if not self.locations:
+            async with get_session().head(WEATHER_API_URL) as response:
+                return {"status": response.status}
+        results = await get_current_weather_batch(self.locations)
+        weather = [result for result in results if not isinstance(result, Exception)]
+        if self.predictions:
+            await asyncio.gather(*[self._predict(w) for w in weather])
+        return {"locations": len(self.locations), "failures": len(results) - len(weather)}
+
+    async def _predict(self, weather: Conditions):
+        await predict_weather(weather.current, weather.location)
+
+    def cancel(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "state": self.state,
+            "duration_ms": round(self.duration * 1000, 1) if self.duration is not None else None,
+            "steps": self.steps,
+        }
+
+warmup = Warmup()
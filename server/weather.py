@@ -1,68 +1,418 @@
 """Weather data service."""
+import asyncio
 import os
+import time
 import aiohttp
-from typing import Dict, Any
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple, Union
+from .cache import TTLCache
+from .forecast import ForecastWindow, forecast_params, parse_windows, window_ttl
+from .history import observation_history
+from .models import Conditions, describe, loads
+from .metrics import stage, record_upstream
+from .resilience import CircuitBreaker, Hedger, budget
+from .config import (
+    WEATHER_POOL_LIMIT,
+    WEATHER_POOL_LIMIT_PER_HOST,
+    WEATHER_KEEPALIVE_SECONDS,
+    WEATHER_DNS_CACHE_SECONDS,
+    WEATHER_CONNECT_TIMEOUT,
+    WEATHER_REQUEST_TIMEOUT,
+    WEATHER_CACHE_ENABLED,
+    WEATHER_CACHE_GRID_DEGREES,
+    WEATHER_CACHE_MAX_ENTRIES,
+    WEATHER_CACHE_MIN_TTL_SECONDS,
+    WEATHER_CACHE_DEFAULT_TTL_SECONDS,
+    WEATHER_FORECAST_MODE,
+    FORECAST_WINDOW_TTL_SECONDS,
+    FORECAST_CACHE_MAX_ENTRIES,
+    BATCH_UPSTREAM_CHUNK_SIZE,
+    WEATHER_BUDGET_SHARE,
+    WEATHER_HEDGE_ENABLED,
+    WEATHER_HEDGE_PERCENTILE,
+    WEATHER_HEDGE_MIN_DELAY_MS,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_SECONDS,
+)
 
 # Free weather API - no key needed for limited requests
-WEATHER_API_URL = "https://api.open-meteo.com/v1/forecast"
+WEATHER_API_URL = os.environ.get("WEATHER_API_URL", "https://api.open-meteo.com/v1/forecast")
 
-async def get_current_weather(latitude: float = 40.7128, longitude: float = -74.0060) -> Dict[str, Any]:
+UNIT_PARAMS = {
+    "temperature_unit": "fahrenheit",
+    "wind_speed_unit": "mph",
+    "timezone": "auto"
+}
+
+class WeatherAPIError(Exception):
+    """Open-Meteo answered with a non-200 status or an unexpected body."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+def _is_client_error(e: Any) -> bool:
+    # A rejected request (bad coordinates); 429 is throttling, not the request's fault
+    return isinstance(e, WeatherAPIError) and e.status is not None and 400 <= e.status < 500 and e.status != 429
+
+def _is_upstream_failure(e: BaseException) -> bool:
+    # 4xx answers (bad coordinates) say nothing about upstream health
+    if isinstance(e, WeatherAPIError) and e.status is not None:
+        return e.status >= 500 or e.status == 429
+    return True
+
+weather_breaker = CircuitBreaker(
+    "open_meteo",
+    failure_threshold=BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=BREAKER_RESET_SECONDS,
+    is_failure=_is_upstream_failure,
+)
+weather_hedger = Hedger(
+    "open_meteo",
+    percentile=WEATHER_HEDGE_PERCENTILE,
+    min_delay=WEATHER_HEDGE_MIN_DELAY_MS / 1000,
+    enabled=WEATHER_HEDGE_ENABLED,
+)
+
+# Shared session, opened/closed by the app lifespan
+_session: Optional[aiohttp.ClientSession] = None
+
+# Connection reuse counters, filled in by the session trace hooks
+_session_stats = {
+    "requests": 0,
+    "connections_created": 0,
+    "connections_reused": 0,
+    "dns_cache_hits": 0,
+    "dns_cache_misses": 0,
+}
+
+def _count(key: str):
+    async def hook(session, ctx, params):
+        _session_stats[key] += 1
+    return hook
+
+def _trace_config() -> aiohttp.TraceConfig:
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(_count("requests"))
+    trace.on_connection_create_end.append(_count("connections_created"))
+    trace.on_connection_reuseconn.append(_count("connections_reused"))
+    trace.on_dns_cache_hit.append(_count("dns_cache_hits"))
+    trace.on_dns_cache_miss.append(_count("dns_cache_misses"))
+    return trace
+
+def create_session() -> aiohttp.ClientSession:
+    """Build a pooled keep-alive session for Open-Meteo requests."""
+    connector = aiohttp.TCPConnector(
+        limit=WEATHER_POOL_LIMIT,
+        limit_per_host=WEATHER_POOL_LIMIT_PER_HOST,
+        keepalive_timeout=WEATHER_KEEPALIVE_SECONDS,
+        ttl_dns_cache=WEATHER_DNS_CACHE_SECONDS,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=WEATHER_REQUEST_TIMEOUT,
+        connect=WEATHER_CONNECT_TIMEOUT,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=timeout,
+        trace_configs=[_trace_config()],
+    )
+
+async def start_session() -> aiohttp.ClientSession:
+    """Open the shared session (called from the app lifespan)."""
+    global _session
+    if _session is None or _session.closed:
+        _session = create_session()
+    return _session
+
+async def close_session():
+    """Close the shared session and release pooled connections."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+def get_session() -> aiohttp.ClientSession:
+    """Return the shared session, creating it lazily outside the app lifespan."""
+    global _session
+    if _session is None or _session.closed:
+        _session = create_session()
+    return _session
+
+def get_session_stats() -> Dict[str, Any]:
+    """Connection reuse statistics for the shared Open-Meteo session."""
+    stats = dict(_session_stats)
+    total = stats["connections_created"] + stats["connections_reused"]
+    stats["reuse_ratio"] = round(stats["connections_reused"] / total, 3) if total else 0.0
+    stats["open"] = _session is not None and not _session.closed
+    return stats
+
+# Current conditions keyed on quantized grid cell
+weather_cache = TTLCache(max_entries=WEATHER_CACHE_MAX_ENTRIES, name="weather")
+weather_cache.decode = Conditions.from_json
+# Forecast windows per grid cell (forecast mode); numpy-backed, so never mirrored to the store
+forecast_cache = TTLCache(max_entries=FORECAST_CACHE_MAX_ENTRIES, name="forecast")
+
+def quantize(latitude: float, longitude: float) -> Tuple[float, float]:
+    """Snap coordinates to the center of their cache grid cell."""
+    step = WEATHER_CACHE_GRID_DEGREES
+    if step <= 0:
+        return latitude, longitude
+    return (
+        round(round(latitude / step) * step, 6),
+        round(round(longitude / step) * step, 6),
+    )
+
+def observation_ttl(weather: Conditions) -> float:
+    """
+    Seconds until Open-Meteo publishes the next `current` observation.
+
+    `current.time` is local time at the location and `current.interval` is the
+    model update step (900s for the 15-minute data).
+    """
+    current = weather.current
+    try:
+        observed = datetime.fromisoformat(current.time).replace(tzinfo=timezone.utc)
+        interval = float(current.interval)
+    except (TypeError, ValueError):
+        return WEATHER_CACHE_DEFAULT_TTL_SECONDS
+    next_observation = observed.timestamp() - weather.location.utc_offset_seconds + interval
+    return min(max(next_observation - time.time(), WEATHER_CACHE_MIN_TTL_SECONDS), interval)
+
+async def get_current_weather(latitude: float = 40.7128, longitude: float = -74.0060) -> Conditions:
+    """
+    Current weather for a location, served from the grid-cell cache.
+
+    Concurrent misses for the same cell share one upstream request. If the
+    upstream fails (or its circuit breaker is open) an expired entry for the
+    cell is returned with `stale` set instead. The result carries the
+    requested coordinates and shares the cached observation, which must not
+    be modified.
+
+    In forecast mode (WEATHER_FORECAST_MODE, needs the cache) misses are
+    derived from the cell's forecast window instead, see `current_from_forecast`.
+
+    Default location: New York City
+    """
+    with stage("weather"):
+        if not WEATHER_CACHE_ENABLED:
+            return await fetch_current_weather(latitude, longitude)
+
+        cell = quantize(latitude, longitude)
+        try:
+            weather = await weather_cache.get_or_fetch(
+                cell,
+                (lambda: current_from_forecast(cell)) if WEATHER_FORECAST_MODE else (lambda: fetch_current_weather(*cell)),
+                observation_ttl,
+            )
+        except Exception:
+            weather = _stale(cell)
+            if weather is None:
+                raise
+        return weather.at(latitude, longitude)
+
+def peek_current_weather(latitude: float, longitude: float) -> Optional[Conditions]:
+    """Fresh cached weather for the location's cell, without going upstream."""
+    if not WEATHER_CACHE_ENABLED:
+        return None
+    return weather_cache.get(quantize(latitude, longitude))
+
+def coordinate_error(latitude: float, longitude: float) -> Optional[ValueError]:
+    """Why Open-Meteo would reject these coordinates, or None when they are in range."""
+    if not -90 <= latitude <= 90:
+        return ValueError(f"Latitude {latitude} is outside -90..90")
+    if not -180 <= longitude <= 180:
+        return ValueError(f"Longitude {longitude} is outside -180..180")
+    return None
+
+async def get_current_weather_batch(
+    locations: List[Tuple[float, float]]
+) -> List[Union[Conditions, Exception]]:
+    """
+    Current weather for many locations in as few upstream requests as possible.
+
+    Cached cells are served from the cache; the remaining distinct cells are
+    fetched with comma-separated coordinate lists, `BATCH_UPSTREAM_CHUNK_SIZE`
+    per request. Each result is either the Conditions or the exception that
+    prevented fetching it, in the order of `locations`.
+
+    Out-of-range coordinates fail on their own without going upstream, and a
+    chunk Open-Meteo rejects with a 4xx is retried one location at a time, so
+    a bad location cannot fail the valid ones sharing its request.
+    """
+    forecast_mode = WEATHER_FORECAST_MODE and WEATHER_CACHE_ENABLED
+    errors = [coordinate_error(lat, lon) for lat, lon in locations]
+    cells = [quantize(lat, lon) if WEATHER_CACHE_ENABLED else (lat, lon) for lat, lon in locations]
+    found: Dict[Tuple[float, float], Union[Conditions, Exception]] = {}
+    missing = []
+    for cell in dict.fromkeys(cell for cell, error in zip(cells, errors) if error is None):
+        cached = weather_cache.lookup(cell) if WEATHER_CACHE_ENABLED else None
+        if cached is None and forecast_mode:
+            window = forecast_cache.lookup(cell)
+            if window is not None:
+                cached = _from_window(cell, window)
+                weather_cache.set(cell, cached, observation_ttl(cached))
+        if cached is not None:
+            found[cell] = cached
+        else:
+            missing.append(cell)
+
+    chunks = [
+        missing[i:i + BATCH_UPSTREAM_CHUNK_SIZE]
+        for i in range(0, len(missing), BATCH_UPSTREAM_CHUNK_SIZE)
+    ]
+    fetch_many = fetch_forecast_windows_many if forecast_mode else fetch_current_weather_many
+    responses = await asyncio.gather(
+        *[fetch_many(chunk) for chunk in chunks],
+        return_exceptions=True,
+    )
+    rejected = [
+        cell
+        for chunk, response in zip(chunks, responses)
+        if len(chunk) > 1 and _is_client_error(response)
+        for cell in chunk
+    ]
+    if rejected:
+        # Find the location Open-Meteo objects to by asking for each on its own
+        retried = await asyncio.gather(*[fetch_many([cell]) for cell in rejected], return_exceptions=True)
+        chunks += [[cell] for cell in rejected]
+        responses += retried
+
+    for chunk, response in zip(chunks, responses):
+        if len(chunk) > 1 and _is_client_error(response):
+            continue
+        for i, cell in enumerate(chunk):
+            if isinstance(response, Exception):
+                found[cell] = _stale(cell) or response
+                continue
+            weather = response[i]
+            if forecast_mode:
+                forecast_cache.set(cell, weather, _window_ttl(weather))
+                weather = _from_window(cell, weather)
+            found[cell] = weather
+            if WEATHER_CACHE_ENABLED:
+                weather_cache.set(cell, weather, observation_ttl(weather))
+
+    results: List[Union[Conditions, Exception]] = []
+    for cell, (lat, lon), error in zip(cells, locations, errors):
+        result = error or found[cell]
+        results.append(result if isinstance(result, Exception) else result.at(lat, lon))
+    return results
+
+async def current_from_forecast(cell: Tuple[float, float]) -> Conditions:
+    """
+    Current conditions for a cell interpolated from its forecast window.
+
+    The window (FORECAST_WINDOW_HOURS of 15-minute and hourly series) is
+    fetched once and reused until FORECAST_WINDOW_TTL_SECONDS pass or it
+    stops covering the next few minutes, so a steadily requested cell costs
+    one upstream request per window instead of one per observation.
+    """
+    window = await forecast_cache.get_or_fetch(cell, lambda: fetch_forecast_window(*cell), _window_ttl)
+    return _from_window(cell, window)
+
+def _from_window(cell: Tuple[float, float], window: ForecastWindow) -> Conditions:
+    weather = window.snapshot()
+    observation_history.record(cell, weather.current)
+    return weather
+
+def _window_ttl(window: ForecastWindow) -> float:
+    return window_ttl(window, FORECAST_WINDOW_TTL_SECONDS)
+
+def _stale(cell: Tuple[float, float]) -> Optional[Conditions]:
+    if WEATHER_CACHE_ENABLED and WEATHER_FORECAST_MODE:
+        # An expired window that still covers the present is a valid forecast, not stale data
+        window = forecast_cache.peek(cell)
+        if window is not None and window.covers(time.time()):
+            return _from_window(cell, window)
+    weather = weather_cache.peek(cell) if WEATHER_CACHE_ENABLED else None
+    return None if weather is None else weather.as_stale()
+
+async def fetch_current_weather(latitude: float = 40.7128, longitude: float = -74.0060) -> Conditions:
     """
     Fetch current weather conditions using Open-Meteo API (no API key needed).
 
     Default location: New York City
     """
+    return (await fetch_current_weather_many([(latitude, longitude)]))[0]
+
+async def fetch_current_weather_many(locations: List[Tuple[float, float]]) -> List[Conditions]:
+    """
+    Fetch current weather for several coordinates in one Open-Meteo request.
+
+    The request gets `WEATHER_BUDGET_SHARE` of the remaining request deadline,
+    is hedged when it runs slower than recent requests, and fails fast while
+    the Open-Meteo circuit breaker is open.
+    """
     params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "current": "temperature_2m,relative_humidity_2m,apparent_temperature,precipitation,weather_code,cloud_cover,wind_speed_10m,wind_direction_10m",
-        "temperature_unit": "fahrenheit",
-        "wind_speed_unit": "mph",
-        "timezone": "auto"
+        "latitude": ",".join(str(lat) for lat, _ in locations),
+        "longitude": ",".join(str(lon) for _, lon in locations),
+        "current": "temperature_2m,relative_humidity_2m,apparent_temperature,precipitation,weather_code,cloud_cover,wind_speed_10m,wind_direction_10m,surface_pressure",
+        **UNIT_PARAMS,
     }
 
-    async with aiohttp.ClientSession() as session:
+    timeout = budget(WEATHER_BUDGET_SHARE, WEATHER_REQUEST_TIMEOUT)
+    data = await weather_breaker.call(
+        lambda: weather_hedger.run(lambda: _request_weather(params), timeout)
+    )
+
+    # Open-Meteo answers a single coordinate with an object, several with a list
+    if isinstance(data, dict):
+        data = [data]
+    if len(data) != len(locations):
+        raise WeatherAPIError(f"Weather API returned {len(data)} results for {len(locations)} locations")
+    results = [Conditions.from_upstream(latitude, longitude, item) for (latitude, longitude), item in zip(locations, data)]
+    for (latitude, longitude), weather in zip(locations, results):
+        observation_history.record(quantize(latitude, longitude), weather.current)
+    return results
+
+async def fetch_forecast_window(latitude: float, longitude: float) -> ForecastWindow:
+    """Fetch the forecast window for one coordinate (forecast mode)."""
+    return (await fetch_forecast_windows_many([(latitude, longitude)]))[0]
+
+async def fetch_forecast_windows_many(locations: List[Tuple[float, float]]) -> List[ForecastWindow]:
+    """
+    Fetch forecast windows for several coordinates in one Open-Meteo request,
+    with the same deadline share, hedging and circuit breaker as
+    `fetch_current_weather_many`.
+    """
+    params = {
+        "latitude": ",".join(str(lat) for lat, _ in locations),
+        "longitude": ",".join(str(lon) for _, lon in locations),
+        **forecast_params(),
+        **UNIT_PARAMS,
+    }
+
+    timeout = budget(WEATHER_BUDGET_SHARE, WEATHER_REQUEST_TIMEOUT)
+    data = await weather_breaker.call(
+        lambda: weather_hedger.run(lambda: _request_weather(params), timeout)
+    )
+    try:
+        return parse_windows(locations, data)
+    except (TypeError, ValueError) as e:
+        raise WeatherAPIError(f"Weather API returned an unusable forecast: {e}")
+
+async def _request_weather(params: Dict[str, Any]) -> Any:
+    session = get_session()
+    start = time.perf_counter()
+    status = "error"
+    try:
         async with session.get(WEATHER_API_URL, params=params) as response:
+            status = response.status
             if response.status == 200:
-                data = await response.json()
-                return {
-                    "location": {
-                        "latitude": latitude,
-                        "longitude": longitude,
-                        "timezone": data.get("timezone", "Unknown")
-                    },
-                    "current": data.get("current", {}),
-                    "timestamp": data.get("current", {}).get("time", "")
-                }
-            else:
-                raise Exception(f"Weather API error: {response.status}")
+                # Decoded straight from the body; callers parse it into models
+                return loads(await response.read())
+            raise WeatherAPIError(f"Weather API error: {response.status}", response.status)
+    except asyncio.TimeoutError:
+        status = "timeout"
+        raise
+    except asyncio.CancelledError:
+        # Losing side of a hedged request
+        status = "cancelled"
+        raise
+    finally:
+        record_upstream("open_meteo", status, time.perf_counter() - start)
 
 def get_weather_description(weather_code: int) -> str:
     """Convert WMO weather code to description."""
-    weather_codes = {
-        0: "Clear sky",
-        1: "Mainly clear",
-        2: "Partly cloudy",
-        3: "Overcast",
-        45: "Foggy",
-        48: "Depositing rime fog",
-        51: "Light drizzle",
-        53: "Moderate drizzle",
-        55: "Dense drizzle",
-        61: "Slight rain",
-        63: "Moderate rain",
-        65: "Heavy rain",
-        71: "Slight snow",
-        73: "Moderate snow",
-        75: "Heavy snow",
-        77: "Snow grains",
-        80: "Slight rain showers",
-        81: "Moderate rain showers",
-        82: "Violent rain showers",
-        85: "Slight snow showers",
-        86: "Heavy snow showers",
-        95: "Thunderstorm",
-        96: "Thunderstorm with slight hail",
-        99: "Thunderstorm with heavy hail"
-    }
-    return weather_codes.get(weather_code, "Unknown")
+    return describe(weather_code)
@@ -0,0 +1,28 @@
+"""Micro-batched predictions hold one admission slot per upstream call."""
+import asyncio
+import json
+
+from server import llm
+from server.admission import AdmissionController
+from server.models import Observation
+
+def test_merged_call_takes_one_slot(monkeypatch):
+    admission = AdmissionController("test", initial_limit=2, enabled=True)
+    in_flight = []
+
+    async def answer(tier, call):
+        in_flight.append(admission.in_flight)
+        return json.dumps([f"prediction {i}" for i in range(5)])
+
+    monkeypatch.setattr(llm, "llm_admission", admission)
+    monkeypatch.setattr(llm, "LLM_BATCH_ENABLED", True)
+    monkeypatch.setattr(llm.endpoint_router, "call", answer)
+
+    async def run():
+        conditions = [Observation("2026-01-01T00:00", 900, temperature_2m=60 + i) for i in range(5)]
+        return await asyncio.gather(*[llm.request_prediction(current, "fast") for current in conditions])
+
+    results = asyncio.run(asyncio.wait_for(run(), 5))
+    assert results == [f"prediction {i}" for i in range(5)]
+    assert in_flight == [1]
+    assert admission.in_flight == 0
@@ -0,0 +1,35 @@
+"""Batch predictions run under the request deadline."""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import app
+from server import llm
+from server.admission import AdmissionController
+from server.models import Conditions, Location, Observation
+
+def test_slow_prediction_in_batch_is_cut_off_by_deadline(monkeypatch):
+    async def slow_completion(**kwargs):
+        await asyncio.sleep(60)
+
+    async def client():
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=slow_completion)))
+
+    async def weather_batch(locations):
+        return [Conditions(Location(lat, lon), Observation("2026-01-01T00:00", 900, temperature_2m=60)) for lat, lon in locations]
+
+    monkeypatch.setattr(app, "REQUEST_DEADLINE_SECONDS", 0.5)
+    monkeypatch.setattr(app, "get_current_weather_batch", weather_batch)
+    monkeypatch.setattr(llm, "get_llm_client", client)
+    monkeypatch.setattr(llm, "llm_admission", AdmissionController("test", enabled=False))
+    monkeypatch.setattr(llm.nowcaster, "nowcast", lambda current, location=None: None)
+    monkeypatch.setattr(llm, "PREDICTION_CACHE_ENABLED", False)
+    monkeypatch.setattr(llm, "LLM_BATCH_ENABLED", False)
+
+    batch = app.BatchRequest(locations=[{"latitude": 1, "longitude": 2}, {"latitude": 3, "longitude": 4}])
+    start = time.monotonic()
+    response = asyncio.run(asyncio.wait_for(app.get_weather_batch(batch), 5))
+    assert time.monotonic() - start < 2
+    results = json.loads(response.body)["results"]
+    assert [result.get("degraded") for result in results] == [True, True]
@@ -0,0 +1,8 @@
+"""Only Vite's content-hashed bundles are served as immutable."""
+from server.static import HASHED_NAME
+
+def test_hashed_name_matches_vite_bundles_only():
+    assert HASHED_NAME.search("assets/index-CO8jQzNZ.js")
+    assert HASHED_NAME.search("assets/index-CHey_2Mj.css")
+    for name in ("apple-touch-icon.png", "site-manifest.json", "assets/apple-touch-icon.png", "index.html"):
+        assert not HASHED_NAME.search(name)
@@ -0,0 +1,36 @@
+"""An abandoned prediction stream must give its admission slot back."""
+import asyncio
+
+from server import llm
+from server.admission import AdmissionController
+from server.models import Observation
+
+def test_cancel_while_stream_opens_releases_slot(monkeypatch):
+    admission = AdmissionController("test", enabled=True)
+    opened = []
+
+    async def hanging_open(tier, call):
+        opened.append(tier)
+        await asyncio.Event().wait()
+
+    async def client():
+        return object()
+
+    monkeypatch.setattr(llm, "llm_admission", admission)
+    monkeypatch.setattr(llm.nowcaster, "nowcast", lambda current, location=None: None)
+    monkeypatch.setattr(llm, "PREDICTION_CACHE_ENABLED", False)
+    monkeypatch.setattr(llm, "get_llm_client", client)
+    monkeypatch.setattr(llm.endpoint_router, "call", hanging_open)
+
+    async def run():
+        streams = [llm.stream_prediction(Observation("2026-01-01T00:00", 900, temperature_2m=60)) for _ in range(3)]
+        tasks = [asyncio.ensure_future(stream.__anext__()) for stream in streams]
+        while len(opened) < 3:
+            await asyncio.sleep(0.01)
+        assert admission.in_flight == 3
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert admission.in_flight == 0
+
+    asyncio.run(asyncio.wait_for(run(), 5))